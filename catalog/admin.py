@@ -1,27 +1,90 @@
 from django.contrib import admin
-from .models import Genre, Book, BookInstance, Author, Language
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import Genre, Book, BookInstance, Author, Language, OverdueReport
+from .pagination import EstimatedCountPaginator
 
-admin.site.register(Genre)
-admin.site.register(Language)
+# Changelists of the large tables take their unfiltered count from table statistics
+# (EstimatedCountPaginator) and skip the second COUNT(*) of the "(N total)" link.
+# Foreign keys are edited with autocomplete widgets rather than a <select> of every row,
+# and inlines show the first rows only, with a link to the rest.
+
+INLINE_LIMIT = 20
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    '''Edits only the first INLINE_LIMIT related rows.'''
+    def get_queryset(self):
+        if not hasattr(self, '_limited_queryset'):
+            self._limited_queryset = super().get_queryset()[:INLINE_LIMIT]
+        return self._limited_queryset
+
+
+def changelist_link(model, count, label, **filters):
+    url = reverse(f'admin:catalog_{model._meta.model_name}_changelist')
+    query = '&'.join(f'{name}={value}' for name, value in filters.items())
+    return format_html('<a href="{}?{}">{} {}</a>', url, query, count, label)
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(Language)
+class LanguageAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
 
 class BooksInstanceInline(admin.TabularInline):
     model = BookInstance
+    formset = LimitedInlineFormSet
+    extra = 0
+    show_change_link = True
+    autocomplete_fields = ('borrower',)
 
 class BooksInline(admin.TabularInline):
     model = Book
+    formset = LimitedInlineFormSet
+    extra = 0
+    show_change_link = True
+    autocomplete_fields = ('genre', 'language')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('genre')
 
 # Register the Admin classes for Book using the decorator
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'display_genre')
+    list_select_related = ('author',)
+    search_fields = ('title', 'isbn')
+    autocomplete_fields = ('author', 'genre', 'language')
+    readonly_fields = ('all_copies',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre slices genre.all(), which reads the prefetched genres
+        return super().get_queryset(request).prefetch_related('genre')
+
+    @admin.display(description='Copies')
+    def all_copies(self, book):
+        if book.pk is None:
+            return '-'
+        return changelist_link(BookInstance, book.bookinstance_set.count(), 'copies, all of them', book__id__exact=book.pk)
+
 # Register the Admin classes for BookInstance using the decorator
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    autocomplete_fields = ('book', 'borrower')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {
@@ -35,10 +98,26 @@ class BookInstanceAdmin(admin.ModelAdmin):
 # Define the admin class
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
+    search_fields = ('last_name', 'first_name')
+    readonly_fields = ('all_books',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-    fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
+    fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death'), 'all_books']
 
     inlines = [BooksInline]
 
+    @admin.display(description='Books')
+    def all_books(self, author):
+        if author.pk is None:
+            return '-'
+        return changelist_link(Book, author.book_set.count(), 'books, all of them', author__id__exact=author.pk)
+
 # Register the admin class with the associated model
-admin.site.register(Author, AuthorAdmin)
\ No newline at end of file
+admin.site.register(Author, AuthorAdmin)
+
+# Daily overdue reports are written by manage.py overdue_report, only listed here
+@admin.register(OverdueReport)
+class OverdueReportAdmin(admin.ModelAdmin):
+    list_display = ('date', 'overdue_count', 'overdue_days_total', 'overdue_days_max', 'generated_at')
+    readonly_fields = ('date', 'generated_at', 'overdue_count', 'overdue_days_total', 'overdue_days_max', 'by_borrower', 'by_book')
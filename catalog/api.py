@@ -0,0 +1,200 @@
+import hashlib
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .pagination import KeysetPaginator
+
+# Fields of each model the JSON read API serves, all of them unless ?fields= picks some.
+# Foreign keys are served as ids, Book.genre as a list of genre ids. Borrowers are never served.
+API_FIELDS = {
+    'Author': ('id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death', 'updated_at', 'version'),
+    'Book': (
+        'id', 'title', 'summary', 'isbn', 'author', 'language', 'genre',
+        'copies_total', 'copies_available', 'copies_on_loan', 'next_due_back', 'updated_at', 'version',
+    ),
+    'BookInstance': ('id', 'book', 'imprint', 'status', 'due_back', 'updated_at', 'version'),
+    'Genre': ('id', 'name', 'updated_at', 'version'),
+    'Language': ('id', 'name', 'updated_at', 'version'),
+}
+
+API_PAGE_SIZE = getattr(settings, 'CATALOG_API_PAGE_SIZE', 50)
+API_MAX_PAGE_SIZE = 200
+
+# Ids per batched lookup, below SQLite's default bound parameter limit
+API_MAX_IDS = 500
+
+
+class APIError(Exception):
+    '''A malformed API request, answered with 400 and the message.'''
+
+
+def parse_fields(entry, value):
+    '''The fields named in ?fields=, in API_FIELDS order, or every field.'''
+    available = API_FIELDS[entry.name]
+    if not value:
+        return available
+    requested = set(value.split(','))
+    unknown = requested - set(available)
+    if unknown:
+        raise APIError(f'Unknown fields: {", ".join(sorted(unknown))}.')
+    return tuple(name for name in available if name in requested)
+
+
+def parse_pk(entry, value):
+    '''value as the model's primary key, None if it is not one.'''
+    try:
+        return entry.model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def parse_ids(entry, value):
+    '''The distinct primary keys of ?ids=, in the order given.'''
+    values = [item for item in value.split(',') if item]
+    if len(values) > API_MAX_IDS:
+        raise APIError(f'At most {API_MAX_IDS} ids per request.')
+    pks = [parse_pk(entry, item) for item in values]
+    if None in pks:
+        raise APIError('ids must be primary keys.')
+    return list(dict.fromkeys(pks))
+
+
+def parse_limit(value):
+    if not value:
+        return API_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise APIError('limit must be a number.')
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise APIError(f'limit must be between 1 and {API_MAX_PAGE_SIZE}.')
+    return limit
+
+
+def row_versions(queryset):
+    '''(pk, version, updated_at) of the rows, the only columns needed to answer a conditional request.'''
+    return list(queryset.order_by().values_list('pk', 'version', 'updated_at'))
+
+
+def fetch_rows(entry, pks, fields):
+    '''The rows of pks serialized with fields, keyed by pk, with their (pk, version, updated_at) for the validators.'''
+    model = entry.model
+    columns = {}
+    many_to_many = []
+    for name in fields:
+        field = model._meta.get_field(name)
+        if field.many_to_many:
+            many_to_many.append(field)
+        else:
+            columns[field.attname] = name
+
+    rows = {}
+    for values in model._default_manager.filter(pk__in=pks).values('pk', 'version', 'updated_at', *columns):
+        row = {name: values[attname] for attname, name in columns.items()}
+        rows[values['pk']] = (row, (values['pk'], values['version'], values['updated_at']))
+
+    for field in many_to_many:
+        # Related ids of every row in one query on the join table
+        source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        links = field.remote_field.through.objects.filter(**{f'{source}__in': list(rows)})
+        for row, _ in rows.values():
+            row[field.name] = []
+        for source_id, target_id in links.order_by(target).values_list(source, target):
+            rows[source_id][0][field.name].append(target_id)
+    return rows
+
+
+def make_etag(entry, fields, versions, extra):
+    '''
+    A strong ETag of a representation: it changes with the version of any row served,
+    with which rows are served and in what order, and with the fields and anything in extra.
+    '''
+    key = (entry.name, fields, [(str(pk), version) for pk, version, _ in versions], extra)
+    return '"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def conditional_response(request, entry, fields, versions, extra, build):
+    '''
+    Answers 304 when the client's If-None-Match or If-Modified-Since matches versions, without
+    calling build(). Otherwise build() returns the payload and the versions of the rows it actually
+    served, which may be newer than versions, and the validators are worked out from those.
+    Clients are asked to revalidate on every use.
+    '''
+    response = get_conditional_response(
+        request, etag=make_etag(entry, fields, versions, extra), last_modified=last_modified(versions),
+    )
+    if response is None:
+        payload, versions = build()
+        response = JsonResponse(payload)
+    response['ETag'] = make_etag(entry, fields, versions, extra)
+    if versions:
+        response['Last-Modified'] = http_date(last_modified(versions))
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def last_modified(versions):
+    '''The latest updated_at of the rows as a timestamp, None without rows.'''
+    return int(max(updated_at for _, _, updated_at in versions).timestamp()) if versions else None
+
+
+def detail_response(request, entry, pk, fields):
+    '''One row. A 304 costs the query reading its version only.'''
+    versions = row_versions(entry.model._default_manager.filter(pk=pk))
+    if not versions:
+        raise Http404(f'No {entry.name} with this id.')
+
+    def build():
+        rows = fetch_rows(entry, [pk], fields)
+        if not rows:
+            # Deleted since its version was read
+            raise Http404(f'No {entry.name} with this id.')
+        row, version = next(iter(rows.values()))
+        return row, [version]
+
+    return conditional_response(request, entry, fields, versions, (), build)
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def list_response(request, entry, fields, limit, cursor):
+    '''
+    One keyset page of rows. Only the keyset columns, version and updated_at of the page are
+    read to answer a conditional request, the page's rows are fetched only to send them.
+    '''
+    ordering = entry.keyset_ordering
+    queryset = entry.model._default_manager.only(*ordering, 'version', 'updated_at')
+    page = KeysetPaginator(queryset, limit, ordering).page(cursor)
+    versions = [(obj.pk, obj.version, obj.updated_at) for obj in page]
+    links = {'next': page_url(request, page.next_cursor), 'previous': page_url(request, page.previous_cursor)}
+
+    def build():
+        rows = fetch_rows(entry, [version[0] for version in versions], fields)
+        served = [version[0] for version in versions if version[0] in rows]
+        return {'results': [rows[pk][0] for pk in served], **links}, [rows[pk][1] for pk in served]
+
+    return conditional_response(request, entry, fields, versions, tuple(links.values()), build)
+
+
+def batch_response(request, entry, pks, fields):
+    '''The rows of many ids in request order, and the ids that do not exist.'''
+    found = {version[0]: version for version in row_versions(entry.model._default_manager.filter(pk__in=pks))}
+    versions = [found[pk] for pk in pks if pk in found]
+
+    def build():
+        rows = fetch_rows(entry, pks, fields)
+        payload = {
+            'results': [rows[pk][0] for pk in pks if pk in rows],
+            'missing': [pk for pk in pks if pk not in rows],
+        }
+        return payload, [rows[pk][1] for pk in pks if pk in rows]
+
+    return conditional_response(request, entry, fields, versions, tuple(str(pk) for pk in pks), build)
@@ -3,3 +3,21 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        # Connect the signal receivers
+        from . import signals
+
+        # PRAGMAs of new SQLite connections
+        from . import db
+
+        # Resolve the generic views' models, forms and permissions once
+        from .registry import build_registry
+        build_registry()
+
+        # Time SQL and template rendering for the metrics middleware, only when metrics are enabled
+        from django.conf import settings
+        if getattr(settings, 'CATALOG_METRICS', False):
+            from .metrics import instrument_connections, instrument_templates
+            instrument_connections()
+            instrument_templates()
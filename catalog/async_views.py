@@ -0,0 +1,212 @@
+import asyncio
+import datetime
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Prefetch, aprefetch_related_objects
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render
+from django.utils.functional import SimpleLazyObject
+from django.views import generic
+from .caching import AsyncVersionedCacheMixin
+from .counters import aget_index_counters
+from .loan_summary import aget_loan_summary, loan_keyset
+from .models import Author, Book, BookInstance, Genre, Language
+from .pagination import KEYSET_ORDERINGS, ListKeysetPaginator, apaginate
+from .querysets import borrowed_copies
+from .registry import RegisteredModelMixin
+from .views import availability
+from .visits import count_visit, get_visits
+
+# Native async versions of the read-only catalog views, served by catalog.urls_async under ASGI.
+# Every query runs through the async ORM before rendering, and the user and their permissions are
+# loaded first, so templates never touch the database from the event loop.
+
+
+async def arender(request, template_name, context=None, status=None, lazy=False):
+    '''
+    render() for async views, resolving request.user and its permissions up front.
+    With lazy, the context may still query and the template is rendered in a thread.
+    '''
+    user = await request.auser()
+    if user.is_authenticated:
+        # Fills the permission cache read by {{ perms }}
+        await sync_to_async(user.get_all_permissions)()
+    request.user = user
+    if lazy:
+        return await sync_to_async(render)(request, template_name, context, status=status)
+    return render(request, template_name, context, status=status)
+
+
+# Home
+async def index(request):
+    '''View function for home page of site.'''
+
+    # The cached counters and the session's user load concurrently, arender() reuses the user
+    counters, _ = await asyncio.gather(aget_index_counters(), request.auser())
+    num_visits = get_visits(request)
+
+    context = {
+        **counters,
+        'num_visits': num_visits,
+    }
+
+    return count_visit(await arender(request, 'index.html', context=context), num_visits)
+
+
+# List view
+class GenericListView(RegisteredModelMixin, AsyncVersionedCacheMixin, generic.View):
+    registry_action = 'view'
+    paginate_by = 10
+
+    def get_cache_scopes(self):
+        return [self.entry.cache_scope]
+
+    async def get(self, request, *args, **kwargs):
+        context = await apaginate(request, self.entry.list_queryset(), self.paginate_by, self.entry.keyset_ordering)
+        context.update(self.get_cache_context(), model_name=self.kwargs['model_name'])
+        return await arender(request, self.get_template_names(), context)
+
+
+# Detail views
+class AsyncDetailView(AsyncVersionedCacheMixin, generic.View):
+    '''Fetches one object with aget() and renders the model's detail template.'''
+    model = None
+
+    def get_cache_scopes(self):
+        return [f"{self.model._meta.model_name}:{self.kwargs['pk']}"]
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    async def get_context_data(self, obj):
+        return {}
+
+    async def get(self, request, *args, **kwargs):
+        obj = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        name = self.model._meta.model_name
+        context = {'object': obj, name: obj, **self.get_cache_context(), **await self.get_context_data(obj)}
+        return await arender(request, f'catalog/{name}_detail.html', context)
+
+
+# Book details
+class BookDetailView(AsyncDetailView):
+    model = Book
+
+    def get_queryset(self):
+        # Book, author and language in one query, genres and copies only if the fragment is rendered
+        return Book.objects.select_related('author', 'language')
+
+    async def get(self, request, *args, **kwargs):
+        book = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        user = await request.auser()
+        context = {'object': book, 'book': book, **self.get_cache_context()}
+
+        key = make_template_fragment_key('book-detail', [book.pk, self.cache_version, user.is_authenticated])
+        if await cache.aget(key) is None:
+            # Genres and copies in one prefetch each, before the template renders the fragment
+            await aprefetch_related_objects([book], 'genre', Prefetch('bookinstance_set', to_attr='copies'))
+            context.update(copies=book.copies, availability=availability(book.copies))
+            return await arender(request, 'catalog/book_detail.html', context)
+
+        # Served from the fragment. Like the sync view the copies are only read if the template
+        # needs them, in a thread, which also covers the fragment expiring in the meantime.
+        copies = SimpleLazyObject(lambda: list(book.bookinstance_set.all()))
+        context.update(copies=copies, availability=SimpleLazyObject(lambda: availability(copies)))
+        return await arender(request, 'catalog/book_detail.html', context, lazy=True)
+
+
+# Author details
+class AuthorDetailView(AsyncDetailView):
+    model = Author
+
+    async def get_context_data(self, author):
+        return {'books': [book async for book in author.book_set.prefetch_related('genre')]}
+
+
+# Genre details
+class GenreDetailView(AsyncDetailView):
+    model = Genre
+
+    async def get_context_data(self, genre):
+        return {'books': [book async for book in genre.book_set.prefetch_related('genre')]}
+
+
+# Language details
+class LanguageDetailView(AsyncDetailView):
+    model = Language
+
+    async def get_context_data(self, language):
+        books = language.book_set.select_related('author').prefetch_related('genre')
+        return {'books': [book async for book in books]}
+
+
+# Book Instance details
+class BookInstanceDetailView(generic.View):
+    async def get(self, request, *args, **kwargs):
+        bookinstance = await aget_object_or_404(BookInstance.objects.select_related('book', 'borrower'), pk=self.kwargs['pk'])
+        context = {'object': bookinstance, 'bookinstance': bookinstance, 'books': bookinstance}
+        return await arender(request, 'catalog/bookinstance_detail.html', context)
+
+
+# Loan lists, login required
+class AsyncLoanListView(generic.View):
+    template_name = None
+    paginate_by = 10
+
+    def get_queryset(self, user):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        context = await apaginate(request, self.get_queryset(user), self.paginate_by, KEYSET_ORDERINGS['BookInstance'])
+        context['bookinstance_list'] = context['object_list']
+        return await arender(request, self.template_name, context)
+
+
+# List showing loaned books
+class LoanedBooksListView(AsyncLoanListView):
+    template_name = 'catalog/bookinstance_borrowed_list.html'
+
+    def get_queryset(self, user):
+        return borrowed_copies()
+
+
+# List showing a user's borrowed books, from their cached loan summary
+class LoanedBooksByUserListView(generic.View):
+    template_name = 'catalog/bookinstance_list_borrowed_user.html'
+    paginate_by = 10
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        summary = await aget_loan_summary(user)
+        keyset_paginated = 'cursor' in request.GET
+        if keyset_paginated:
+            # Cursors seek through the cached rows rather than the table
+            paginator = ListKeysetPaginator(summary.loans, self.paginate_by, loan_keyset)
+            page = paginator.page(request.GET.get('cursor') or None)
+        else:
+            paginator = Paginator(summary.loans, self.paginate_by)
+            page_number = request.GET.get('page') or 1
+            try:
+                page = paginator.page(paginator.num_pages if page_number == 'last' else int(page_number))
+            except (InvalidPage, ValueError):
+                raise Http404('Invalid page.')
+        context = {
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'keyset_paginated': keyset_paginated,
+            'bookinstance_list': page.object_list,
+            'summary': summary,
+            'today': datetime.date.today(),
+        }
+        return await arender(request, self.template_name, context)
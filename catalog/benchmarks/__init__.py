@@ -0,0 +1,8 @@
+'''
+Reproducible load benchmarks for the catalog app.
+
+seed.py fills a throwaway database with synthetic data, scenarios.py lists the requests
+that are driven through the real URL patterns, and runner.py measures them sequentially
+and under concurrent WSGI/ASGI load and compares the results with a saved JSON baseline.
+Run with: python manage.py benchmark --scale small --output baseline.json
+'''
@@ -0,0 +1,182 @@
+import asyncio
+import math
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+
+def percentile(values, percent):
+    '''Nearest-rank percentile.'''
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def latency_summary(timings_ms):
+    return {
+        'p50': round(percentile(timings_ms, 50), 3),
+        'p95': round(percentile(timings_ms, 95), 3),
+        'p99': round(percentile(timings_ms, 99), 3),
+        'max': round(max(timings_ms), 3),
+    }
+
+
+def make_clients(context):
+    '''One test client per role, the logged in ones via force_login.'''
+    clients = {'anonymous': Client()}
+    for role, user in context.users().items():
+        clients[role] = Client()
+        if user is not None:
+            clients[role].force_login(user)
+    return clients
+
+
+def run_sequential(scenarios, context, requests):
+    '''Runs every scenario `requests` times through the test client, one request at a time.'''
+    clients = make_clients(context)
+    results = {}
+    for scenario in scenarios:
+        client = clients[scenario.role]
+        timings = []
+        errors = 0
+        queries = []
+        # Counted with a wrapper rather than connection.queries, whose log is capped at 9000 entries
+        with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+            start = time.perf_counter()
+            for i in range(requests):
+                request_start = time.perf_counter()
+                response = getattr(client, scenario.method)(scenario.path(context, i))
+                timings.append((time.perf_counter() - request_start) * 1000)
+                errors += response.status_code >= 400
+            elapsed = time.perf_counter() - start
+
+        results[scenario.name] = {
+            'requests': requests,
+            'errors': errors,
+            'throughput_rps': round(requests / elapsed, 1),
+            'latency_ms': latency_summary(timings),
+            'queries_per_request': round(len(queries) / requests, 2),
+        }
+    return results
+
+
+def run_wsgi_load(scenarios, context, workers, requests):
+    '''
+    Concurrent load through the WSGI handler: `workers` threads, each with its own clients
+    and database connection, share `requests` read requests round-robin over the scenarios.
+    '''
+    read_scenarios = [scenario for scenario in scenarios if not scenario.writes]
+    timings = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        clients = make_clients(context)
+        local_timings, local_errors = [], 0
+        try:
+            for i in counter:
+                scenario = read_scenarios[i % len(read_scenarios)]
+                start = time.perf_counter()
+                response = getattr(clients[scenario.role], scenario.method)(scenario.path(context, i))
+                local_timings.append((time.perf_counter() - start) * 1000)
+                local_errors += response.status_code >= 400
+        finally:
+            connections.close_all()
+        with lock:
+            timings.extend(local_timings)
+            errors.append(local_errors)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return load_summary(workers, timings, sum(errors), elapsed)
+
+
+def run_asgi_load(scenarios, context, workers, requests, urlconf=None):
+    '''
+    The same read mix as run_wsgi_load, as `workers` concurrent tasks against the ASGI handler,
+    optionally routed through another urlconf (locallibrary.urls_async for the async views).
+    '''
+    read_scenarios = [scenario for scenario in scenarios if not scenario.writes]
+    timings = []
+    errors = 0
+
+    async def worker(client_by_role, indexes):
+        nonlocal errors
+        for i in indexes:
+            scenario = read_scenarios[i % len(read_scenarios)]
+            start = time.perf_counter()
+            response = await getattr(client_by_role[scenario.role], scenario.method)(scenario.path(context, i))
+            timings.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+    async def main(client_by_role):
+        await asyncio.gather(*[
+            worker(client_by_role, range(offset, requests, workers)) for offset in range(workers)
+        ])
+
+    # Reuse the session cookies of logged in sync clients
+    client_by_role = {}
+    for role, sync_client in make_clients(context).items():
+        client_by_role[role] = AsyncClient()
+        client_by_role[role].cookies = sync_client.cookies
+
+    with override_settings(ROOT_URLCONF=urlconf or settings.ROOT_URLCONF):
+        start = time.perf_counter()
+        asyncio.run(main(client_by_role))
+        elapsed = time.perf_counter() - start
+    return load_summary(workers, timings, errors, elapsed)
+
+
+def load_summary(workers, timings, errors, elapsed):
+    return {
+        'workers': workers,
+        'requests': len(timings),
+        'errors': errors,
+        'throughput_rps': round(len(timings) / elapsed, 1),
+        'latency_ms': latency_summary(timings),
+    }
+
+
+def metadata(scale):
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'scale': scale,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Lists regressions against a baseline: p95 latency more than `tolerance` (a fraction) slower,
+    more queries per request, or lower concurrent throughput.
+    '''
+    regressions = []
+    for name, current in results.get('scenarios', {}).items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['latency_ms']['p95'] > previous['latency_ms']['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['latency_ms']['p95']}ms -> {current['latency_ms']['p95']}ms")
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}")
+
+    for name, current in results.get('load', {}).items():
+        previous = baseline.get('load', {}).get(name)
+        if previous is None:
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"load:{name}: {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.urls import reverse
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from .seed import LIBRARIAN_USERNAME
+
+
+class Scenario:
+    '''
+    One benchmarked request. role picks the logged in user ('anonymous', 'borrower' or 'librarian')
+    and path(context, iteration) builds the URL of each iteration.
+    '''
+
+    def __init__(self, name, path, method='get', role='anonymous', writes=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.role = role
+        self.writes = writes
+
+
+class BenchmarkContext:
+    '''Sample objects from the seeded database that the scenarios request.'''
+
+    def __init__(self, iterations):
+        User = get_user_model()
+        self.book = Book.objects.annotate(copies=Count('bookinstance')).order_by('-copies', 'pk').first()
+        self.author = Author.objects.order_by('pk').first()
+        self.genre = Genre.objects.order_by('pk').first()
+        self.language = Language.objects.order_by('pk').first()
+        self.copy = BookInstance.objects.order_by('pk').first()
+        self.librarian = User.objects.get(username=LIBRARIAN_USERNAME)
+        self.borrower = (
+            User.objects.filter(bookinstance__status='o')
+            .annotate(loans=Count('bookinstance')).order_by('-loans', 'pk').first()
+        )
+
+        # Copies borrowed and then returned by the write scenarios, one per iteration
+        self.available_copies = list(
+            BookInstance.objects.filter(status='a').order_by('pk').values_list('pk', flat=True)[:iterations]
+        )
+
+    def users(self):
+        return {'borrower': self.borrower, 'librarian': self.librarian}
+
+
+def generic_list(model_name):
+    return lambda context, i: reverse('generic-list', kwargs={'model_name': model_name})
+
+
+SCENARIOS = [
+    Scenario('index', lambda context, i: reverse('index')),
+    *[
+        Scenario(f'generic-list:{model_name}', generic_list(model_name))
+        for model_name in ['Author', 'Book', 'BookInstance', 'Genre', 'Language']
+    ],
+    Scenario('generic-list:Book:deep-offset', lambda context, i: reverse('generic-list', kwargs={'model_name': 'Book'}) + '?page=last'),
+    Scenario('book-detail', lambda context, i: context.book.get_absolute_url()),
+    Scenario('author-detail', lambda context, i: context.author.get_absolute_url()),
+    Scenario('genre-detail', lambda context, i: context.genre.get_absolute_url()),
+    Scenario('language-detail', lambda context, i: context.language.get_absolute_url()),
+    Scenario('bookinstance-detail', lambda context, i: context.copy.get_absolute_url()),
+    Scenario('search', lambda context, i: reverse('search') + '?q=title'),
+    Scenario('borrowed', lambda context, i: reverse('borrowed'), role='librarian'),
+    Scenario('my-borrowed', lambda context, i: reverse('my-borrowed'), role='borrower'),
+    Scenario(
+        'borrow-book',
+        lambda context, i: reverse('borrow-book', kwargs={'pk': context.available_copies[i % len(context.available_copies)]}),
+        method='post', role='borrower', writes=True,
+    ),
+    Scenario(
+        'return-book-librarian',
+        lambda context, i: reverse('return-book-librarian', kwargs={'pk': context.available_copies[i % len(context.available_copies)]}),
+        method='post', role='librarian', writes=True,
+    ),
+]
@@ -0,0 +1,99 @@
+import datetime
+import random
+import time
+import uuid
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection, transaction
+from django.utils import timezone
+from catalog.book_counters import rebuild_book_counters
+from catalog.bulk import insert_rows
+from catalog.counters import invalidate_index_counters
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import rebuild_search_index
+
+# Named dataset sizes, any of them can be overridden on the command line
+SCALES = {
+    'tiny': {'books': 100, 'instances': 1_000, 'users': 10},
+    'small': {'books': 2_000, 'instances': 20_000, 'users': 100},
+    'medium': {'books': 20_000, 'instances': 500_000, 'users': 1_000},
+    'large': {'books': 100_000, 'instances': 2_000_000, 'users': 10_000},
+}
+
+LIBRARIAN_USERNAME = 'benchmark-librarian'
+NUM_GENRES = 20
+NUM_LANGUAGES = 5
+BATCH_SIZE = 5000
+
+# Status mix of seeded copies: half available, the rest on loan, in maintenance or reserved
+STATUS_WEIGHTS = {'a': 50, 'o': 30, 'm': 10, 'r': 10}
+
+
+def seed(books, instances, users, random_seed=0, log=print):
+    '''
+    Bulk inserts a synthetic catalog into the current database.
+    The same arguments and random_seed always produce the same data.
+    '''
+    rng = random.Random(random_seed)
+    start = time.perf_counter()
+    User = get_user_model()
+
+    with transaction.atomic():
+        languages = Language.objects.bulk_create([Language(name=f'Language {i}') for i in range(NUM_LANGUAGES)])
+        genres = Genre.objects.bulk_create([Genre(name=f'Genre {i}') for i in range(NUM_GENRES)])
+        authors = Author.objects.bulk_create(
+            [Author(first_name=f'First {i}', last_name=f'Last {i}') for i in range(max(1, books // 10))],
+            batch_size=BATCH_SIZE,
+        )
+        book_objects = Book.objects.bulk_create(
+            [
+                Book(
+                    title=f'The Title {i}' if i % 3 == 0 else f'Title {i}',
+                    summary=f'Synthetic summary for book {i}',
+                    isbn=f'{i:013d}',
+                    author=authors[i % len(authors)],
+                    language=languages[i % len(languages)],
+                )
+                for i in range(books)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        insert_rows(Book.genre.through, ['book_id', 'genre_id'], [
+            (book.pk, genre.pk)
+            for book in book_objects
+            for genre in rng.sample(genres, rng.randint(1, 3))
+        ])
+
+        user_objects = User.objects.bulk_create(
+            [User(username=f'benchmark-user-{i}', password='!') for i in range(users)],
+            batch_size=BATCH_SIZE,
+        )
+        librarian = User.objects.create(username=LIBRARIAN_USERNAME, password='!')
+        librarian.user_permissions.add(*Permission.objects.filter(content_type__app_label='catalog'))
+
+        pk_field = BookInstance._meta.pk
+        due_back_field = BookInstance._meta.get_field('due_back')
+        now = BookInstance._meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+        today = datetime.date.today()
+        statuses = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()), k=instances)
+        for offset in range(0, instances, BATCH_SIZE):
+            rows = []
+            for i in range(offset, min(offset + BATCH_SIZE, instances)):
+                on_loan = statuses[i] == 'o'
+                due_back = today + datetime.timedelta(days=rng.randint(-30, 30)) if on_loan else None
+                rows.append((
+                    pk_field.get_db_prep_save(uuid.UUID(int=rng.getrandbits(128), version=4), connection),
+                    book_objects[i % len(book_objects)].pk,
+                    'Synthetic imprint',
+                    statuses[i],
+                    due_back_field.get_db_prep_save(due_back, connection),
+                    rng.choice(user_objects).pk if on_loan else None,
+                    now,
+                ))
+            insert_rows(BookInstance, ['id', 'book_id', 'imprint', 'status', 'due_back', 'borrower_id', 'updated_at'], rows)
+
+    # Bulk inserts send no signals
+    rebuild_search_index()
+    rebuild_book_counters()
+    invalidate_index_counters()
+    log(f'Seeded {books} books, {instances} copies and {users} users in {time.perf_counter() - start:.1f}s')
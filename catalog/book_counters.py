@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Book, BookInstance
+from .versions import next_version
+
+# Counters Book keeps of its copies. copies_total counts every copy, the others the copies in one status.
+STATUS_COUNTERS = {'a': 'copies_available', 'o': 'copies_on_loan'}
+COUNTER_FIELDS = ('copies_total', *STATUS_COUNTERS.values())
+
+# Books per UPDATE ... WHERE id IN (...), below SQLite's default bound parameter limit
+CHUNK_SIZE = 900
+
+
+def chunked(items, size=CHUNK_SIZE):
+    items = list(items)
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def next_due_back():
+    '''The earliest due date of the copies on loan of the book being updated or annotated.'''
+    return Subquery(
+        BookInstance.objects.filter(book=OuterRef('pk'), status='o', due_back__isnull=False)
+        .order_by('due_back').values('due_back')[:1]
+    )
+
+
+def counter_deltas(changes):
+    '''
+    Sums copy changes into counter deltas per book. Each change is a (book_id, old_status, new_status)
+    tuple, with None as old_status for a new copy and as new_status for a deleted one.
+    Every book changed appears, even when its deltas cancel out, since next_due_back may still move.
+    '''
+    deltas = defaultdict(Counter)
+    for book_id, old_status, new_status in changes:
+        if book_id is None:
+            continue
+        delta = deltas[book_id]
+        if old_status is not None:
+            delta['copies_total'] -= 1
+            if old_status in STATUS_COUNTERS:
+                delta[STATUS_COUNTERS[old_status]] -= 1
+        if new_status is not None:
+            delta['copies_total'] += 1
+            if new_status in STATUS_COUNTERS:
+                delta[STATUS_COUNTERS[new_status]] += 1
+    return deltas
+
+
+def apply_copy_changes(changes):
+    '''
+    Moves the counters of the books whose copies changed, with F() expressions so concurrent
+    transitions add up, and recomputes their next_due_back. Run it in the transaction that
+    changed the copies, after the change. Books with the same deltas share one UPDATE.
+    The counters are part of the book's row, so its updated_at and version move too.
+    '''
+    groups = defaultdict(list)
+    for book_id, delta in counter_deltas(changes).items():
+        groups[tuple(sorted((field, value) for field, value in delta.items() if value))].append(book_id)
+
+    now = timezone.now()
+    for deltas, book_ids in groups.items():
+        updates = {field: F(field) + value for field, value in deltas}
+        for chunk in chunked(book_ids):
+            Book.objects.filter(pk__in=chunk).update(**updates, next_due_back=next_due_back(), updated_at=now, version=next_version(Book))
+
+
+def copies_counted(**filters):
+    return Coalesce(
+        Subquery(
+            BookInstance.objects.filter(book=OuterRef('pk'), **filters)
+            .order_by().values('book').annotate(count=Count('pk')).values('count')
+        ),
+        0,
+    )
+
+
+def actual_counters():
+    '''The counters of the book being updated or annotated, counted from its copies.'''
+    return {
+        'copies_total': copies_counted(),
+        'copies_available': copies_counted(status='a'),
+        'copies_on_loan': copies_counted(status='o'),
+        'next_due_back': next_due_back(),
+    }
+
+
+def drifted_books(books=None):
+    '''Books whose stored counters differ from their copies.'''
+    books = Book.objects.all() if books is None else books
+    books = books.alias(**{f'actual_{field}': expression for field, expression in actual_counters().items()})
+    drift = Q()
+    for field in COUNTER_FIELDS:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    drift |= Q(next_due_back__isnull=True, actual_next_due_back__isnull=False)
+    drift |= Q(next_due_back__isnull=False, actual_next_due_back__isnull=True)
+    drift |= Q(next_due_back__isnull=False, actual_next_due_back__isnull=False) & ~Q(next_due_back=F('actual_next_due_back'))
+    return books.filter(drift)
+
+
+def rebuild_book_counters(book_ids=None):
+    '''Recounts the counters of the books that drifted, all books by default. Returns how many were repaired.'''
+    if book_ids is None:
+        selections = [Book.objects.all()]
+    else:
+        selections = [Book.objects.filter(pk__in=chunk) for chunk in chunked(book_ids)]
+
+    repaired = 0
+    for books in selections:
+        drifted = list(drifted_books(books).values_list('pk', flat=True))
+        for chunk in chunked(drifted):
+            with transaction.atomic():
+                Book.objects.filter(pk__in=chunk).update(**actual_counters(), updated_at=timezone.now(), version=next_version(Book))
+        repaired += len(drifted)
+    return repaired
@@ -0,0 +1,15 @@
+from django.db import connection
+
+
+def insert_rows(model, columns, rows):
+    '''INSERT of already database-ready tuples with one executemany, bypassing model instantiation.'''
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(column).column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
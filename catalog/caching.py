@@ -0,0 +1,178 @@
+import hashlib
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from .models import Book, BookInstance
+from .routers import pin_to_primary, reads_from_replica, replicas_lag
+
+# Rendered pages and fragments are keyed by the versions of the objects they show.
+# A version is a counter per scope ('book:12', 'list:genre', ...) that signals bump
+# whenever something shown under that scope changes, so stale entries are never read
+# again and simply expire. The timeout is only a safety net.
+# A write bumps the versions before a lagging replica has its rows, so anything rendered
+# from a replica could be stored under versions it does not show yet and outlive the lag.
+# Page cache misses are therefore rendered from the primary, and fragments rendered from
+# a replica are not stored.
+VERSION_KEY_PREFIX = 'catalog:version:'
+PAGE_KEY_PREFIX = 'catalog:page:'
+PAGE_CACHE_TIMEOUT = getattr(settings, 'CATALOG_PAGE_CACHE_TIMEOUT', 60 * 60)
+VERSION_TIMEOUT = None
+
+
+def version_key(scope):
+    return VERSION_KEY_PREFIX + scope
+
+
+def get_versions(scopes):
+    '''Returns the current version of every scope, in order, in one cache round trip.'''
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A new or evicted counter starts from the clock rather than from 1,
+            # so it cannot land on a version an older page was stored under.
+            cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def cache_version(scopes):
+    '''Returns a short string naming the current versions of the scopes, for use in cache keys.'''
+    return '.'.join(str(version) for version in get_versions(scopes))
+
+
+def bump_versions(scopes):
+    '''Moves every scope to a new version, making pages and fragments built from it unreachable.'''
+    for scope in set(scopes):
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            # Nothing was cached under this scope yet
+            cache.add(version_key(scope), time.time_ns(), VERSION_TIMEOUT)
+
+
+def book_scopes(book_ids):
+    '''
+    Returns the scopes showing any of the books: their detail pages, the author, language and
+    genre pages listing them, and the lists of books and copies.
+    '''
+    book_ids = list(book_ids)
+    if not book_ids:
+        return set()
+    scopes = {'list:book', 'list:bookinstance'}
+    scopes.update(f'book:{pk}' for pk in book_ids)
+    for author_id, language_id in Book.objects.filter(pk__in=book_ids).values_list('author_id', 'language_id'):
+        if author_id:
+            scopes.add(f'author:{author_id}')
+        if language_id:
+            scopes.add(f'language:{language_id}')
+    genre_ids = Book.genre.through.objects.filter(book_id__in=book_ids).values_list('genre_id', flat=True)
+    scopes.update(f'genre:{pk}' for pk in set(genre_ids))
+    return scopes
+
+
+def copy_scopes(book_instance_ids):
+    '''
+    Returns the scopes showing any of the copies: their book's detail page, the list of copies,
+    and the list of books with their copy counters.
+    '''
+    book_ids = BookInstance.objects.filter(pk__in=list(book_instance_ids)).values_list('book_id', flat=True)
+    return {'list:bookinstance', 'list:book'} | {f'book:{pk}' for pk in set(book_ids) if pk}
+
+
+def is_cacheable_request(request, user=None):
+    '''Only anonymous GETs are served whole from the page cache, everyone else gets fragments.'''
+    user = user or request.user
+    return request.method in ('GET', 'HEAD') and not user.is_authenticated
+
+
+def fragment_timeout():
+    '''Timeout for {% cache %} fragments rendered now: 0, not stored, when reads go to a lagging replica.'''
+    return 0 if replicas_lag() and reads_from_replica() else PAGE_CACHE_TIMEOUT
+
+
+def page_key(request, version):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{PAGE_KEY_PREFIX}{path}:{version}'
+
+
+def cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+class VersionedCacheMixin:
+    '''
+    Serves anonymous GETs from a page cache keyed by the versions of get_cache_scopes(),
+    and exposes the same versions to templates as cache_version for {% cache %} fragments,
+    with cache_timeout. Pages missing from the cache are rendered from the primary.
+    '''
+    def get_cache_scopes(self):
+        raise NotImplementedError('VersionedCacheMixin requires get_cache_scopes()')
+
+    def dispatch(self, request, *args, **kwargs):
+        self.cache_version = cache_version(self.get_cache_scopes())
+        if not is_cacheable_request(request):
+            self.cache_timeout = fragment_timeout()
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_key(request, self.cache_version)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached_response(cached)
+
+        # Rendered here rather than after the view returns, so the template's queries are pinned too
+        with pin_to_primary():
+            self.cache_timeout = PAGE_CACHE_TIMEOUT
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        if response.status_code == 200 and hasattr(response, 'render'):
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = self.cache_version
+        context['cache_timeout'] = self.cache_timeout
+        return context
+
+
+class AsyncVersionedCacheMixin:
+    '''VersionedCacheMixin for views with async handlers, which render their own context.'''
+    def get_cache_scopes(self):
+        raise NotImplementedError('AsyncVersionedCacheMixin requires get_cache_scopes()')
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        cacheable = is_cacheable_request(request, user)
+        # The versions and the cached page in one trip to the cache, most backends are sync underneath
+        self.cache_version, key, cached = await sync_to_async(self.lookup_page)(request, cacheable)
+        if cached is not None:
+            return cached_response(cached)
+
+        if not cacheable:
+            self.cache_timeout = fragment_timeout()
+            return await super().dispatch(request, *args, **kwargs)
+
+        with pin_to_primary():
+            self.cache_timeout = PAGE_CACHE_TIMEOUT
+            response = await super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        return response
+
+    def lookup_page(self, request, cacheable):
+        version = cache_version(self.get_cache_scopes())
+        if not cacheable:
+            return version, None, None
+        key = page_key(request, version)
+        return version, key, cache.get(key)
+
+    def get_cache_context(self):
+        return {'cache_version': self.cache_version, 'cache_timeout': self.cache_timeout}
@@ -0,0 +1,56 @@
+# Sidebar state for base_generic.html, worked out once per request from the resolved URL
+# instead of by substring tests on request.path in the template.
+
+# Sidebar entry of views that are not about one model
+NAV_BY_URL_NAME = {
+    'index': 'home',
+    'search': 'search',
+    'borrowed': 'borrowed',
+    'renew-book-librarian': 'borrowed',
+    'return-book-librarian': 'borrowed',
+    'borrow-book': 'book',
+    'my-borrowed': 'book',
+    'book-detail': 'book',
+    'author-detail': 'author',
+    'genre-detail': 'genre',
+    'language-detail': 'language',
+    'bookinstance-detail': 'bookinstance',
+}
+
+# Catalog permissions the sidebar checks
+NAV_PERMISSIONS = (
+    'can_mark_returned', 'add_author', 'add_book', 'add_genre', 'add_language', 'add_bookinstance', 'delete_bookinstance',
+)
+
+
+def active_nav(match):
+    '''The sidebar entry of a resolved URL: 'home', a lower case model name, 'add-<model>', or None.'''
+    if match is None:
+        return None
+    if match.url_name in NAV_BY_URL_NAME:
+        return NAV_BY_URL_NAME[match.url_name]
+    model_name = match.kwargs.get('model_name', '').lower()
+    if not model_name:
+        return None
+    if match.url_name == 'create':
+        return f'add-{model_name}'
+    return model_name
+
+
+def navigation(request):
+    '''Adds nav: the active sidebar entry, and the sidebar permissions resolved in one lookup.'''
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_superuser:
+        # As in has_perm, without loading every permission there is
+        perms = dict.fromkeys(NAV_PERMISSIONS, True)
+    elif user is not None and user.is_authenticated:
+        permissions = user.get_all_permissions()
+        perms = {name: f'catalog.{name}' in permissions for name in NAV_PERMISSIONS}
+    else:
+        perms = dict.fromkeys(NAV_PERMISSIONS, False)
+    return {
+        'nav': {
+            'active': active_nav(getattr(request, 'resolver_match', None)),
+            'perms': perms,
+        },
+    }
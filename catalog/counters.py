@@ -0,0 +1,69 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connections, router
+from .models import Book, Author, BookInstance, Genre
+
+# Cache key and lifetime for the home page counters.
+# Signals clear the key whenever a counted model changes, the timeout is only a safety net.
+INDEX_COUNTERS_KEY = 'catalog:index-counters'
+INDEX_COUNTERS_TIMEOUT = 60 * 60
+
+
+def index_counter_querysets():
+    '''Returns the querysets counted on the home page, keyed by context name.'''
+    return {
+        'num_books': Book.objects.all(),
+        'num_instances': BookInstance.objects.all(),
+        'num_instances_available': BookInstance.objects.filter(status__exact='a'),
+        'num_authors': Author.objects.all(),
+        'num_genres': Genre.objects.all(),
+        'num_books_with_the': Book.objects.filter(title__icontains='the'),
+    }
+
+
+def compute_index_counters():
+    '''Counts every home page queryset in a single database round trip.'''
+    using = router.db_for_read(Book)
+    connection = connections[using]
+    selects = []
+    params = []
+
+    # Each queryset is compiled by the ORM (so lookups like icontains stay backend specific)
+    # and wrapped in a scalar COUNT(*) sub-select of one outer SELECT.
+    for name, queryset in index_counter_querysets().items():
+        sql, query_params = queryset.order_by().values('pk').query.get_compiler(using).as_sql()
+        selects.append(
+            f'(SELECT COUNT(*) FROM ({sql}) {connection.ops.quote_name(name + "_rows")}) '
+            f'AS {connection.ops.quote_name(name)}'
+        )
+        params.extend(query_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(selects), params)
+        row = cursor.fetchone()
+
+    return dict(zip(index_counter_querysets().keys(), row))
+
+
+def get_index_counters():
+    '''Returns the home page counters, from the cache when possible.'''
+    counters = cache.get(INDEX_COUNTERS_KEY)
+    if counters is None:
+        counters = compute_index_counters()
+        cache.set(INDEX_COUNTERS_KEY, counters, INDEX_COUNTERS_TIMEOUT)
+    return counters
+
+
+async def aget_index_counters():
+    '''get_index_counters() for async views.'''
+    counters = await cache.aget(INDEX_COUNTERS_KEY)
+    if counters is None:
+        # Still the single round trip, the async ORM would run six separate COUNTs
+        counters = await sync_to_async(compute_index_counters)()
+        await cache.aset(INDEX_COUNTERS_KEY, counters, INDEX_COUNTERS_TIMEOUT)
+    return counters
+
+
+def invalidate_index_counters():
+    '''Drops the cached home page counters so the next request recomputes them.'''
+    cache.delete(INDEX_COUNTERS_KEY)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def sqlite_pragma_statements(pragmas):
+    '''PRAGMA statements for a {name: value} mapping, in order.'''
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+@receiver(connection_created, dispatch_uid='catalog.db.apply_sqlite_pragmas')
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # Settings like journal_mode=WAL persist in the file, the rest (synchronous, cache_size,
+    # mmap_size, query_only) only last as long as the connection, so set them on every connect.
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'CATALOG_SQLITE_PRAGMAS', {}).get(connection.alias)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragma_statements(pragmas):
+            cursor.execute(statement)
+
+
+def estimated_row_count(model, using=DEFAULT_DB_ALIAS):
+    '''
+    The number of rows in the model's table according to the planner statistics,
+    or None when the table has not been analyzed or the backend keeps none.
+    '''
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # -1 until the table is first vacuumed or analyzed
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            # Written by ANALYZE, each row's stat starts with the number of rows its index covers.
+            # That is the whole table except for partial indexes, which only count their rows.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND (idx IS NULL OR idx NOT IN '
+                '(SELECT name FROM pragma_index_list(%s) WHERE partial))',
+                [table, table],
+            )
+        else:
+            return None
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    estimate = max(int(str(stat).split()[0]) for stat, in rows)
+    return estimate if estimate >= 0 else None
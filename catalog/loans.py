@@ -0,0 +1,219 @@
+import datetime
+import uuid
+from dataclasses import dataclass
+from django.db import transaction
+from django.utils import timezone
+from django.dispatch import Signal
+from .book_counters import apply_copy_changes
+from .models import BookInstance
+from .versions import next_version
+
+# Default loan period for a new borrow
+LOAN_PERIOD = datetime.timedelta(weeks=4)
+
+# Outcomes of a loan transition
+OK = 'ok'
+CONFLICT = 'conflict'
+NOT_FOUND = 'not_found'
+
+ACTION_PAST_TENSE = {
+    'borrow': 'borrowed',
+    'return': 'returned',
+    'renew': 'renewed',
+    'maintenance': 'sent to maintenance',
+}
+
+# Ids per IN (...) list, below SQLite's default bound parameter limit
+BULK_CHUNK_SIZE = 900
+
+# Attempts of a bulk transition before giving up on a batch that keeps racing other writers
+BULK_RETRIES = 3
+
+# Sent after a copy changed loan state, with the new status and the affected borrower(s) and book(s).
+# Transitions are single UPDATE statements, so post_save is never sent for them.
+loan_transitioned = Signal()
+
+
+@dataclass(frozen=True)
+class LoanResult:
+    '''Outcome of a loan transition on one copy.'''
+    outcome: str
+    book_instance_id: object
+    message: str = ''
+
+    @property
+    def ok(self):
+        return self.outcome == OK
+
+    @property
+    def conflict(self):
+        return self.outcome == CONFLICT
+
+
+def transition(pk, expected_status, action, **changes):
+    '''
+    Compare-and-set on one copy: reads its (status, borrower) and then runs
+    UPDATE ... SET changes WHERE pk = pk AND status = expected_status AND borrower_id = observed borrower.
+    Only the changed columns (and updated_at and version) are written, and a copy that changed in between is reported
+    as a conflict instead of being overwritten. The book's copy counters are updated in the same transaction.
+    '''
+    current = BookInstance.objects.filter(pk=pk).values('status', 'borrower_id', 'book_id').first()
+    if current is None:
+        return LoanResult(NOT_FOUND, pk, 'No such copy.')
+    if current['status'] != expected_status:
+        return conflict(pk, action, current['status'])
+
+    # No savepoint inside an outer transaction, a failure there rolls back the caller anyway
+    with transaction.atomic(savepoint=False):
+        updated = (
+            BookInstance.objects
+            .filter(pk=pk, status=expected_status, borrower_id=current['borrower_id'])
+            .update(**changes, updated_at=timezone.now(), version=next_version(BookInstance))
+        )
+        if updated:
+            # The book's copy counters move with the copy, or not at all
+            apply_copy_changes([(current['book_id'], expected_status, changes.get('status', expected_status))])
+    if not updated:
+        # Lost the race to another transition between the read and the update
+        return conflict(pk, action, BookInstance.objects.filter(pk=pk).values_list('status', flat=True).first())
+
+    loan_transitioned.send(
+        sender=BookInstance,
+        action=action,
+        pks=[pk],
+        status=changes.get('status', expected_status),
+        borrower_ids={current['borrower_id'], getattr(changes.get('borrower'), 'pk', None)} - {None},
+        book_ids={current['book_id']} - {None},
+    )
+    return LoanResult(OK, pk)
+
+
+def conflict(pk, action, status):
+    '''A conflict result naming the status the copy is actually in.'''
+    label = dict(BookInstance.LOAN_STATUS).get(status, 'unknown')
+    return LoanResult(CONFLICT, pk, f'This copy cannot be {ACTION_PAST_TENSE[action]} right now (status: {label}).')
+
+
+def borrow(pk, user, due_back=None):
+    '''Loans an available copy to user.'''
+    due_back = due_back or datetime.date.today() + LOAN_PERIOD
+    return transition(pk, 'a', 'borrow', status='o', borrower=user, due_back=due_back)
+
+
+def return_copy(pk):
+    '''Marks a copy that is on loan as available again.'''
+    return transition(pk, 'o', 'return', status='a', borrower=None, due_back=None)
+
+
+def renew(pk, due_back):
+    '''Moves the due date of a copy that is on loan.'''
+    return transition(pk, 'o', 'renew', due_back=due_back)
+
+
+class BulkTransitionRace(Exception):
+    '''A copy changed between reading and updating a batch, the batch is retried.'''
+
+
+def bulk_transition(pks, expected_statuses, action, **changes):
+    '''
+    Applies one transition to many copies in a single transaction.
+    Copies are read once and updated with one UPDATE per chunk of ids, guarded by the versions they
+    were read with. A copy that changed in between makes the whole batch retry.
+    Returns one LoanResult per distinct id, in input order.
+    '''
+    pks = list(dict.fromkeys(str(pk) for pk in pks))
+    for attempt in range(BULK_RETRIES):
+        try:
+            return _bulk_transition(pks, expected_statuses, action, changes)
+        except BulkTransitionRace:
+            if attempt == BULK_RETRIES - 1:
+                raise
+
+
+def _bulk_transition(pks, expected_statuses, action, changes):
+    canonical = {pk: normalize_pk(pk) for pk in pks}
+    valid = list(dict.fromkeys(pk for pk in canonical.values() if pk is not None))
+
+    with transaction.atomic():
+        current = read_copies(valid)
+        eligible = [pk for pk in valid if pk in current and current[pk][0] in expected_statuses]
+
+        # Each copy is only updated if nothing wrote it since it was read. Every write gives a row a
+        # version above the table's highest (catalog.versions), so a chunk is guarded by the highest
+        # version it was read with: one UPDATE per chunk, however many borrowers it spans.
+        updated = 0
+        now = timezone.now()
+        for chunk in chunked(eligible):
+            updated += (
+                BookInstance.objects
+                .filter(pk__in=chunk, version__lte=max(current[pk][3] for pk in chunk))
+                .update(**changes, updated_at=now, version=next_version(BookInstance))
+            )
+
+        # Something else changed a copy after it was read, roll back the whole batch and retry
+        if updated != len(eligible):
+            raise BulkTransitionRace()
+
+        apply_copy_changes(
+            (current[pk][2], current[pk][0], changes.get('status', current[pk][0])) for pk in eligible
+        )
+
+    if eligible:
+        loan_transitioned.send(
+            sender=BookInstance,
+            action=action,
+            pks=eligible,
+            status=changes.get('status', expected_statuses[0]),
+            borrower_ids={current[pk][1] for pk in eligible} - {None},
+            book_ids={current[pk][2] for pk in eligible} - {None},
+        )
+
+    eligible = set(eligible)
+    results = []
+    for pk in pks:
+        if canonical[pk] in eligible:
+            results.append(LoanResult(OK, pk))
+        elif canonical[pk] not in current:
+            results.append(LoanResult(NOT_FOUND, pk, 'No such copy.'))
+        else:
+            results.append(conflict(pk, action, current[canonical[pk]][0]))
+    return results
+
+
+def read_copies(pks):
+    '''(status, borrower_id, book_id, version) of the copies that exist, keyed by canonical id.'''
+    current = {}
+    for chunk in chunked(pks):
+        for pk, *row in (
+            BookInstance.objects.filter(pk__in=chunk).values_list('pk', 'status', 'borrower_id', 'book_id', 'version')
+        ):
+            current[str(pk)] = tuple(row)
+    return current
+
+
+def normalize_pk(pk):
+    '''Canonical string form of a copy id, or None if it is not a UUID.'''
+    try:
+        return str(uuid.UUID(str(pk)))
+    except ValueError:
+        return None
+
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def bulk_return(pks):
+    '''Marks every copy that is on loan as available.'''
+    return bulk_transition(pks, ('o',), 'return', status='a', borrower=None, due_back=None)
+
+
+def bulk_renew(pks, due_back):
+    '''Moves the due date of every copy that is on loan.'''
+    return bulk_transition(pks, ('o',), 'renew', due_back=due_back)
+
+
+def bulk_mark_maintenance(pks):
+    '''Takes copies out of circulation, ending any loan on them.'''
+    return bulk_transition(pks, ('a', 'o', 'r'), 'maintenance', status='m', borrower=None, due_back=None)
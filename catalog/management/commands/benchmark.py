@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from catalog.benchmarks import runner
+from catalog.benchmarks.scenarios import SCENARIOS, BenchmarkContext
+from catalog.benchmarks.seed import SCALES, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database and benchmarks the catalog URLs sequentially and under '
+        'concurrent WSGI load, ASGI load of the sync views and ASGI load of the async views. Writes a JSON report and optionally compares it with a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--books', type=int, help='Overrides the number of books of the scale.')
+        parser.add_argument('--instances', type=int, help='Overrides the number of copies of the scale.')
+        parser.add_argument('--users', type=int, help='Overrides the number of borrowers of the scale.')
+        parser.add_argument('--requests', type=int, default=50, help='Sequential requests per scenario.')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent clients of the load runs.')
+        parser.add_argument('--load-requests', type=int, default=400, help='Total requests of each load run.')
+        parser.add_argument('--scenario', action='append', help='Only run scenarios whose name starts with this.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--compare', help='Baseline JSON report to compare with, fails on regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown as a fraction (0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        scale = dict(SCALES[options['scale']])
+        for key in ('books', 'instances', 'users'):
+            if options[key] is not None:
+                scale[key] = options[key]
+        scale['users'] = max(1, scale['users'])
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['scenario'] or scenario.name.startswith(tuple(options['scenario']))
+        ]
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # Over-budget warnings of every slow request would drown the report
+        logging.getLogger('catalog.metrics').setLevel(logging.ERROR)
+
+        # A file database, so concurrent threads get real connections of their own
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                seed(log=self.stdout.write, **scale)
+                context = BenchmarkContext(options['requests'])
+                results = {
+                    'meta': runner.metadata(scale),
+                    'scenarios': runner.run_sequential(scenarios, context, options['requests']),
+                    'load': {
+                        'wsgi': runner.run_wsgi_load(scenarios, context, options['workers'], options['load_requests']),
+                        'asgi': runner.run_asgi_load(scenarios, context, options['workers'], options['load_requests']),
+                        'asgi-async': runner.run_asgi_load(
+                            scenarios, context, options['workers'], options['load_requests'], urlconf='locallibrary.urls_async',
+                        ),
+                    },
+                }
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        self.print_report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = runner.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def print_report(self, results):
+        self.stdout.write(f'{"scenario":<34}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"queries":>9}{"errors":>8}')
+        for name, result in results['scenarios'].items():
+            self.stdout.write(
+                f'{name:<34}{result["throughput_rps"]:>9}{result["latency_ms"]["p50"]:>9}'
+                f'{result["latency_ms"]["p95"]:>9}{result["queries_per_request"]:>9}{result["errors"]:>8}'
+            )
+        for name, result in results['load'].items():
+            self.stdout.write(
+                f'{"load:" + name + " x" + str(result["workers"]):<34}{result["throughput_rps"]:>9}'
+                f'{result["latency_ms"]["p50"]:>9}{result["latency_ms"]["p95"]:>9}{"":>9}{result["errors"]:>8}'
+            )
@@ -0,0 +1,205 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from catalog import loans, views
+from catalog.benchmarks.runner import latency_summary
+from catalog.models import Book, BookInstance
+from catalog.querysets import borrowed_copies
+
+PROFILES = ('development', 'production')
+VISIT_COUNTERS = ('cookie', 'session')
+
+
+def session_get_visits(request):
+    '''The home page visit counter as it used to be, an UPDATE of the session on every view.'''
+    num_visits = request.session.get('num_visits', 0)
+    request.session['num_visits'] = num_visits + 1
+    return num_visits
+
+
+def session_count_visit(response, visits):
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks concurrent borrow/return writes, with concurrent loan list reads, under the development '
+        'and production database profiles (CATALOG_DB_PROFILE). Each profile runs in its own process. '
+        'With --read home the readers request the home page instead, counting visits both in a cookie '
+        'and in the session as the home page used to.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Threads borrowing and returning copies.')
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading meanwhile.')
+        parser.add_argument('--read', choices=('loans', 'home'), default='loans', help='What the readers read.')
+        parser.add_argument('--visits', choices=VISIT_COUNTERS, default='cookie', help='Internal: home page visit counter.')
+        parser.add_argument('--operations', type=int, default=200, help='Borrow/return cycles per writer.')
+        parser.add_argument('--copies', type=int, default=50, help='Copies the writers compete for.')
+        parser.add_argument('--profile', choices=PROFILES, action='append', help='Profiles to run, all by default.')
+        parser.add_argument('--worker', action='store_true', help='Internal: run one profile in this process.')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_profile(options)))
+            return
+
+        forwarded = [
+            f'--{name}={options[name]}' for name in ('writers', 'readers', 'operations', 'copies', 'read')
+        ]
+        runs = [
+            (profile, visits) for profile in options['profile'] or PROFILES
+            for visits in (VISIT_COUNTERS if options['read'] == 'home' else ('cookie',))
+        ]
+        self.stdout.write(
+            f'{"profile":<22}{"cycles/s":>10}{"p50 ms":>9}{"p95 ms":>9}{"conflicts":>11}{"locked":>8}'
+            f'{"reads/s":>9}{"read p95":>10}{"errors":>8}'
+        )
+        for profile, visits in runs:
+            completed = subprocess.run(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_db', '--worker',
+                 f'--visits={visits}', *forwarded],
+                env={**os.environ, 'CATALOG_DB_PROFILE': profile},
+                capture_output=True, text=True,
+            )
+            if completed.returncode:
+                raise CommandError(f'{profile} run failed:\n{completed.stderr}')
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            name = f'{profile}/{visits}' if options['read'] == 'home' else profile
+            self.stdout.write(
+                f'{name:<22}{result["cycles_per_second"]:>10}{result["latency_ms"]["p50"]:>9}'
+                f'{result["latency_ms"]["p95"]:>9}{result["conflicts"]:>11}{result["locked"]:>8}'
+                f'{result["reads_per_second"]:>9}{result["read_p95_ms"] or "-":>10}{result["read_errors"]:>8}'
+            )
+
+    def run_profile(self, options):
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            # The production profile's reader is the same database on its own connection
+            for alias in connections:
+                if alias != connection.alias:
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = connection.settings_dict['NAME']
+            setup_test_environment()
+            try:
+                if options['visits'] == 'session':
+                    with mock.patch.object(views, 'get_visits', session_get_visits), \
+                            mock.patch.object(views, 'count_visit', session_count_visit):
+                        return self.run_load(options)
+                return self.run_load(options)
+            finally:
+                teardown_test_environment()
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_load(self, options):
+        User = get_user_model()
+        users = [User.objects.create(username=f'benchmark-writer-{i}') for i in range(options['writers'])]
+        book = Book.objects.create(title='Benchmark Title', summary='Summary', isbn='0000000000000')
+        copies = [BookInstance.objects.create(book=book, imprint='Imprint', status='a').pk for _ in range(options['copies'])]
+        connections.close_all()
+
+        timings, outcomes = [], {'conflicts': 0, 'locked': 0}
+        reads, read_timings, read_errors = [0], [], [0]
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def writer(user, seed):
+            generator = random.Random(seed)
+            local_timings, conflicts, locked = [], 0, 0
+            try:
+                for _ in range(options['operations']):
+                    pk = generator.choice(copies)
+                    start = time.perf_counter()
+                    try:
+                        result = loans.borrow(pk, user)
+                        if result.ok:
+                            loans.return_copy(pk)
+                        else:
+                            conflicts += 1
+                    except OperationalError:
+                        locked += 1
+                    local_timings.append((time.perf_counter() - start) * 1000)
+                    # A request boundary, closes the connection unless it is persistent
+                    close_old_connections()
+            finally:
+                connections.close_all()
+            with lock:
+                timings.extend(local_timings)
+                outcomes['conflicts'] += conflicts
+                outcomes['locked'] += locked
+
+        def read_loans(client):
+            list(borrowed_copies()[:10])
+
+        def read_home(client):
+            # Every reader is one visitor, keeping its cookies between views
+            if client.get(reverse('index')).status_code != 200:
+                raise OperationalError('home page failed')
+
+        read = read_home if options['read'] == 'home' else read_loans
+
+        def reader():
+            count, errors, local_timings = 0, 0, []
+            client = Client()
+            try:
+                while writing.is_set():
+                    start = time.perf_counter()
+                    try:
+                        read(client)
+                        count += 1
+                        local_timings.append((time.perf_counter() - start) * 1000)
+                    except OperationalError:
+                        errors += 1
+                    close_old_connections()
+            finally:
+                connections.close_all()
+            with lock:
+                reads[0] += count
+                read_errors[0] += errors
+                read_timings.extend(local_timings)
+
+        readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        writers = [threading.Thread(target=writer, args=(user, i)) for i, user in enumerate(users)]
+        for thread in readers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        return {
+            'profile': os.environ.get('CATALOG_DB_PROFILE', 'development'),
+            'journal_mode': self.journal_mode(),
+            'cycles_per_second': round(len(timings) / elapsed, 1),
+            'latency_ms': latency_summary(timings),
+            'reads_per_second': round(reads[0] / elapsed, 1),
+            'read_p95_ms': latency_summary(read_timings)['p95'] if read_timings else None,
+            'read_errors': read_errors[0],
+            **outcomes,
+        }
+
+    def journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
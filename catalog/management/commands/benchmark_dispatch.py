@@ -0,0 +1,86 @@
+import time
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.forms import modelform_factory
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import reverse
+from catalog.benchmarks.runner import percentile
+from catalog.registry import get_entry
+from catalog.views import GenericCreateView
+
+
+def legacy_resolve(model_name):
+    '''The per-request work the generic create view used to do before the registry.'''
+    model = apps.get_model('catalog', model_name)
+    fields_map = {
+        'Book': ['title', 'author', 'summary', 'isbn', 'genre', 'language'],
+        'Author': ['first_name', 'last_name', 'date_of_birth', 'date_of_death'],
+        'Genre': ['name'],
+        'Language': ['name'],
+        'BookInstance': ['book', 'imprint', 'due_back', 'borrower', 'status'],
+    }
+    form_class = modelform_factory(model, fields=fields_map.get(model_name, '__all__'))
+    permissions = ['catalog.add_' + model_name.lower()]
+    success_url = reverse('generic-list', kwargs={'model_name': model_name})
+    return model, form_class, permissions, success_url
+
+
+def registry_resolve(model_name):
+    '''The same lookups through the precompiled registry.'''
+    entry = get_entry(model_name)
+    return entry.model, entry.forms['add'], [entry.permissions['add']], reverse('generic-list', kwargs={'model_name': model_name})
+
+
+def legacy_unknown():
+    try:
+        apps.get_model('catalog', 'Unknown')
+    except LookupError:
+        pass
+
+
+def registry_unknown():
+    try:
+        get_entry('Unknown')
+    except Http404:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmarks generic view dispatch: model, form and permission resolution, before/after the registry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000, help='Timed iterations per path.')
+        parser.add_argument('--model', default='Book', help='Model name to resolve.')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        model_name = options['model']
+        self.report('before: resolve', lambda: legacy_resolve(model_name), iterations)
+        self.report('after: resolve', lambda: registry_resolve(model_name), iterations)
+        self.report('before: unknown model', legacy_unknown, iterations)
+        self.report('after: unknown model', registry_unknown, iterations)
+
+        # A full GET of the Genre create form, which renders without touching the database
+        factory = RequestFactory()
+        user = get_user_model()(username='benchmark', is_superuser=True, is_active=True)
+        view = GenericCreateView.as_view()
+
+        def dispatch():
+            request = factory.get('/catalog/Genre/create/')
+            request.user = user
+            view(request, model_name='Genre').render()
+
+        self.report('after: GET Genre create view', dispatch, max(1, iterations // 10))
+
+    def report(self, label, function, iterations):
+        function()
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        self.stdout.write(
+            f'{label:<32} p50 {percentile(timings, 50):9.1f}us  p95 {percentile(timings, 95):9.1f}us'
+        )
@@ -0,0 +1,68 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from catalog.benchmarks.runner import percentile
+from catalog.benchmarks.seed import SCALES, seed
+from catalog.counters import compute_index_counters, get_index_counters
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+
+def legacy_index_counters():
+    '''The six separate COUNT queries the home page used to run on every hit.'''
+    return {
+        'num_books': Book.objects.all().count(),
+        'num_instances': BookInstance.objects.all().count(),
+        'num_genres': Genre.objects.all().count(),
+        'num_instances_available': BookInstance.objects.filter(status__exact='a').count(),
+        'num_books_with_the': Book.objects.filter(title__icontains='the').count(),
+        'num_authors': Author.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the home page counters (before/after) on a seeded, throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='medium')
+        parser.add_argument('--books', type=int, help='Overrides the number of books of the scale.')
+        parser.add_argument('--instances', type=int, help='Overrides the number of copies of the scale.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed iterations per path.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            scale = dict(SCALES[options['scale']])
+            for key in ('books', 'instances'):
+                if options[key] is not None:
+                    scale[key] = options[key]
+            seed(log=self.stdout.write, **scale)
+            cache.clear()
+            self.report('before: six COUNT queries', legacy_index_counters, options['requests'])
+            self.report('after: single query, uncached', compute_index_counters, options['requests'])
+            get_index_counters()
+            self.report('after: cached', get_index_counters, options['requests'])
+
+            client = Client()
+            self.report('after: GET index (cached)', lambda: client.get(reverse('index')), options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def report(self, label, func, iterations):
+        '''Times a callable and prints queries per call and latency percentiles.'''
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f'{label:<32} queries/request={len(queries) / iterations:.1f} '
+            f'p50={percentile(timings, 50):.2f}ms p95={percentile(timings, 95):.2f}ms'
+        )
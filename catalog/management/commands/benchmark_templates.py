@@ -0,0 +1,78 @@
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template import RequestContext
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import resolve
+from catalog.benchmarks.runner import percentile
+
+# Loader setups to compare: templates read and compiled on every render, and compiled once
+LOADERS = {
+    'uncached': ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader'],
+    'cached': [('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader',
+    ])],
+}
+
+PATHS = ['/catalog/', '/catalog/Book/', '/catalog/author/1', '/catalog/Genre/create/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Times rendering base_generic.html (through a page that only extends it) for an anonymous visitor '
+        'and a librarian, with uncached and cached loaders and template debug on and off.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=2000, help='Renders per configuration and user.')
+
+    def handle(self, *args, **options):
+        # A throwaway database for the librarian and their permissions
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users = self.users()
+            self.stdout.write(f'{"loader":<10}{"debug":<7}{"user":<11}{"p50 us":>9}{"p95 us":>9}{"renders/s":>11}')
+            for loader, loaders in LOADERS.items():
+                for debug in (True, False):
+                    engine = self.engine(loaders, debug)
+                    for role, user in users.items():
+                        timings = self.time_renders(engine, user, options['renders'])
+                        self.stdout.write(
+                            f'{loader:<10}{str(debug):<7}{role:<11}{percentile(timings, 50):>9.1f}'
+                            f'{percentile(timings, 95):>9.1f}{1e6 / (sum(timings) / len(timings)):>11.0f}'
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def users(self):
+        librarian = get_user_model().objects.create(username='benchmark-librarian')
+        librarian.user_permissions.add(*Permission.objects.filter(content_type__app_label='catalog'))
+        return {'anonymous': AnonymousUser(), 'librarian': get_user_model().objects.get(pk=librarian.pk)}
+
+    def engine(self, loaders, debug):
+        params = {key: value for key, value in settings.TEMPLATES[0].items() if key != 'BACKEND'}
+        params.update(NAME=f'benchmark-{debug}', APP_DIRS=False)
+        params['OPTIONS'] = {**params['OPTIONS'], 'loaders': loaders, 'debug': debug}
+        return DjangoTemplates(params).engine
+
+    def time_renders(self, engine, user, renders):
+        factory = RequestFactory()
+        requests = []
+        for path in PATHS:
+            request = factory.get(path)
+            request.user = user
+            request.resolver_match = resolve(path)
+            requests.append(request)
+
+        timings = []
+        for i in range(renders):
+            request = requests[i % len(requests)]
+            start = time.perf_counter()
+            # A page that is only the base template, so the timing is the sidebar and layout
+            engine.from_string('{% extends "base_generic.html" %}').render(RequestContext(request, {}))
+            timings.append((time.perf_counter() - start) * 1e6)
+        return timings
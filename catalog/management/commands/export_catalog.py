@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalog.export import EXPORT_FORMATS, EXPORT_MODELS, parse_since, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Streams one catalog model to stdout or a file as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_name', choices=sorted(EXPORT_MODELS))
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--since', help='Only rows updated at or after this ISO date/datetime.')
+        parser.add_argument('--output', help='File to write, defaults to stdout.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_since(options['since'])
+            if since is None:
+                raise CommandError('--since must be an ISO date or datetime.')
+
+        lines = stream_export(options['model_name'], options['export_format'], since)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,29 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from catalog.reports import generate_overdue_report
+
+
+class Command(BaseCommand):
+    help = 'Stores the daily overdue loan report, counted by borrower and by book in the database. Run once a day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Report date (YYYY-MM-DD), loans due before it are overdue. Defaults to today.')
+        parser.add_argument('--top', type=int, default=10, help='Borrowers and books to print.')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD.')
+
+        report = generate_overdue_report(today)
+        self.stdout.write(
+            f'{report.date}: {report.overdue_count} overdue copies, '
+            f'{report.overdue_days_total} days overdue in total, longest {report.overdue_days_max} days'
+        )
+        for title, groups, label in (('By borrower', report.by_borrower, 'username'), ('By book', report.by_book, 'title')):
+            self.stdout.write(title)
+            for group in groups[:options['top']]:
+                self.stdout.write(f"  {group['count']:>6}  {group['days']:>8} days  {group[label]}")
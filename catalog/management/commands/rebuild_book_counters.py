@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from catalog.book_counters import drifted_books, rebuild_book_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts Book's denormalized copy counters (copies_total, copies_available, copies_on_loan, "
+        'next_due_back) from BookInstance, for the books whose counters drifted. Run after bulk imports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int, help='Books to check, all of them by default.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the books that drifted.')
+
+    def handle(self, *args, **options):
+        book_ids = options['book_ids'] or None
+        if options['dry_run']:
+            books = drifted_books()
+            if book_ids:
+                books = books.filter(pk__in=book_ids)
+            self.stdout.write(f'{books.count()} books have drifted counters.')
+            return
+
+        repaired = rebuild_book_counters(book_ids)
+        self.stdout.write(f'Repaired the counters of {repaired} books.')
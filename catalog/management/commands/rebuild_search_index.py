@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from catalog.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the FTS5 book search index from the catalog tables.'
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            self.stdout.write('Full-text search index is only used on SQLite, nothing to rebuild.')
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,211 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter, deque
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('catalog.metrics')
+
+# Samples kept per URL name for the rolling percentiles
+WINDOW_SIZE = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Probe of the current request, filled in by record_query and the instrumented backend template.
+# A context variable follows async views into the threads their ORM calls run in.
+_probe = contextvars.ContextVar('catalog_request_probe', default=None)
+
+
+class RequestProbe:
+    '''SQL statements (sql, seconds) and template time collected while a request is handled.'''
+    __slots__ = ('queries', 'template_seconds')
+
+    def __init__(self):
+        self.queries = []
+        self.template_seconds = 0.0
+
+
+class RequestSample:
+    '''Measurements of one request.'''
+    __slots__ = ('queries', 'db_seconds', 'template_seconds', 'wall_seconds')
+
+    def __init__(self, queries, db_seconds, template_seconds, wall_seconds):
+        self.queries = queries
+        self.db_seconds = db_seconds
+        self.template_seconds = template_seconds
+        self.wall_seconds = wall_seconds
+
+
+class MetricsRegistry:
+    '''Thread-safe rolling window of samples per URL name, plus all-time counts and sums.'''
+
+    FIELDS = RequestSample.__slots__
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.windows = {}
+            self.counts = Counter()
+            self.sums = {}
+
+    def record(self, view, sample):
+        with self.lock:
+            self.windows.setdefault(view, deque(maxlen=self.window_size)).append(sample)
+            self.counts[view] += 1
+            sums = self.sums.setdefault(view, dict.fromkeys(self.FIELDS, 0))
+            for field in self.FIELDS:
+                sums[field] += getattr(sample, field)
+
+    def snapshot(self):
+        '''Returns {view: {'count', 'sum': {...}, 'quantiles': {field: {q: value}}}}.'''
+        with self.lock:
+            windows = {view: list(samples) for view, samples in self.windows.items()}
+            counts = dict(self.counts)
+            sums = {view: dict(values) for view, values in self.sums.items()}
+
+        snapshot = {}
+        for view, samples in windows.items():
+            quantiles = {}
+            for field in self.FIELDS:
+                values = sorted(getattr(sample, field) for sample in samples)
+                quantiles[field] = {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+            snapshot[view] = {'count': counts[view], 'sum': sums[view], 'quantiles': quantiles}
+        return snapshot
+
+
+registry = MetricsRegistry()
+
+
+def instrument_templates():
+    '''
+    Wraps the Django template backend's render so the middleware can attribute render time.
+    Only top-level renders go through the backend, includes are counted inside their parent.
+    '''
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_render(self, *args, **kwargs)
+        finally:
+            probe = _probe.get()
+            if probe is not None:
+                probe.template_seconds += time.perf_counter() - start
+
+    render.instrumented = True
+    Template.render = render
+
+
+def record_query(execute, sql, params, many, context):
+    '''Execute wrapper timing every statement run while a request probe is active.'''
+    probe = _probe.get()
+    if probe is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        probe.queries.append((sql, time.perf_counter() - start))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # First in the list, execute_wrapper() blocks pop the last wrapper when they exit
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def instrument_connections():
+    '''Installs record_query on every database connection as it is opened, in any thread.'''
+    from django.db.backends.signals import connection_created
+    connection_created.connect(install_query_recorder, dispatch_uid='catalog.metrics.record_query')
+
+
+class QueryMetricsMiddleware:
+    '''
+    Records queries, DB time, template time and wall time per resolved URL name,
+    and logs requests over CATALOG_QUERY_BUDGET with their repeated SQL.
+    Runs natively under both WSGI and ASGI, so async views are not pushed back into a thread.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        probe = RequestProbe()
+        token = _probe.set(probe)
+        start = time.perf_counter()
+        try:
+            # TemplateResponses are rendered inside get_response, so their time is included
+            response = self.get_response(request)
+        finally:
+            _probe.reset(token)
+        self.record(request, probe, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        probe = RequestProbe()
+        token = _probe.set(probe)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _probe.reset(token)
+        self.record(request, probe, time.perf_counter() - start)
+        return response
+
+    def record(self, request, probe, wall_seconds):
+        queries = probe.queries
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        registry.record(view, RequestSample(
+            queries=len(queries),
+            db_seconds=sum(elapsed for _, elapsed in queries),
+            template_seconds=probe.template_seconds,
+            wall_seconds=wall_seconds,
+        ))
+
+        budget = getattr(settings, 'CATALOG_QUERY_BUDGET', None)
+        if budget is not None and len(queries) > budget:
+            duplicates = Counter(sql for sql, _ in queries).most_common()
+            logger.warning(
+                '%s %s (%s) ran %d queries, over the budget of %d. Repeated SQL:\n%s',
+                request.method, request.path, view, len(queries), budget,
+                '\n'.join(f'{count}x {sql}' for sql, count in duplicates if count > 1) or '(none)',
+            )
+
+
+def prometheus_text(snapshot):
+    '''Formats a registry snapshot in the Prometheus text exposition format.'''
+    metrics = (
+        ('wall_seconds', 'catalog_request_seconds', 'Wall time per request.'),
+        ('db_seconds', 'catalog_request_db_seconds', 'Time spent in SQL per request.'),
+        ('template_seconds', 'catalog_request_template_seconds', 'Template render time per request.'),
+        ('queries', 'catalog_request_queries', 'SQL queries per request.'),
+    )
+    lines = []
+    for field, name, description in metrics:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} summary')
+        for view, data in sorted(snapshot.items()):
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile, value in data['quantiles'][field].items():
+                lines.append(f'{name}{{view="{label}",quantile="{quantile}"}} {value:g}')
+            lines.append(f'{name}_sum{{view="{label}"}} {data["sum"][field]:g}')
+            lines.append(f'{name}_count{{view="{label}"}} {data["count"]}')
+    return '\n'.join(lines) + '\n'
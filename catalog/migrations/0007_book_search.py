@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# FTS5 index over Book.title, Book.summary, the author's name, genre names and ISBN.
+# The rowid of each entry is the Book id. Only created on SQLite, other backends
+# fall back to LIKE filters in catalog.search.
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE catalog_book_search USING fts5(
+    title, summary, authors, genres, isbn,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# Column weights used by ORDER BY rank: title, summary, authors, genres, isbn
+CONFIGURE_RANK = "INSERT INTO catalog_book_search(catalog_book_search, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0, 2.0, 10.0)')"
+
+POPULATE_SEARCH_TABLE = """
+INSERT INTO catalog_book_search(rowid, title, summary, authors, genres, isbn)
+SELECT b.id, b.title, b.summary,
+       COALESCE(a.first_name || ' ' || a.last_name, ''),
+       COALESCE((SELECT group_concat(g.name, ' ') FROM catalog_book_genre bg
+                 JOIN catalog_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id), ''),
+       b.isbn
+FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+"""
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SEARCH_TABLE)
+    schema_editor.execute(CONFIGURE_RANK)
+    schema_editor.execute(POPULATE_SEARCH_TABLE)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS catalog_book_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_bookinstance_loan_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('overdue_days_total', models.PositiveIntegerField(default=0)),
+                ('overdue_days_max', models.PositiveIntegerField(default=0)),
+                ('by_borrower', models.JSONField(default=list)),
+                ('by_book', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_copies(apps, schema_editor):
+    # The same counts as catalog.book_counters.actual_counters(), against the historical models
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+
+    def counted(**filters):
+        copies = BookInstance.objects.filter(book=OuterRef('pk'), **filters).order_by().values('book')
+        return Coalesce(Subquery(copies.annotate(count=Count('pk')).values('count')), 0)
+
+    Book.objects.using(schema_editor.connection.alias).update(
+        copies_total=counted(),
+        copies_available=counted(status='a'),
+        copies_on_loan=counted(status='o'),
+        next_due_back=Subquery(
+            BookInstance.objects.filter(book=OuterRef('pk'), status='o', due_back__isnull=False)
+            .order_by('due_back').values('due_back')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_overdue_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='next_due_back',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(count_copies, migrations.RunPython.noop),
+    ]
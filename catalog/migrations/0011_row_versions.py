@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_book_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='version',
+            field=models.BigIntegerField(db_default=0, db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='version',
+            field=models.BigIntegerField(db_default=0, db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookinstance',
+            name='version',
+            field=models.BigIntegerField(db_default=0, db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='version',
+            field=models.BigIntegerField(db_default=0, db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='language',
+            name='version',
+            field=models.BigIntegerField(db_default=0, db_index=True, editable=False),
+        ),
+    ]
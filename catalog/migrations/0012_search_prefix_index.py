@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Rebuilds the FTS5 table of 0007 with a prefix index for 3 character prefixes only.
+# catalog.search never expands terms shorter than MIN_PREFIX_LENGTH = 3, so the
+# 2 character index was built and kept up to date without ever being read.
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE catalog_book_search USING fts5(
+    title, summary, authors, genres, isbn,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '{prefix}'
+)
+"""
+
+# Column weights used by ORDER BY rank: title, summary, authors, genres, isbn
+CONFIGURE_RANK = "INSERT INTO catalog_book_search(catalog_book_search, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0, 2.0, 10.0)')"
+
+POPULATE_SEARCH_TABLE = """
+INSERT INTO catalog_book_search(rowid, title, summary, authors, genres, isbn)
+SELECT b.id, b.title, b.summary,
+       COALESCE(a.first_name || ' ' || a.last_name, ''),
+       COALESCE((SELECT group_concat(g.name, ' ') FROM catalog_book_genre bg
+                 JOIN catalog_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id), ''),
+       b.isbn
+FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+"""
+
+
+def recreate_search_table(prefix):
+    def recreate(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute('DROP TABLE IF EXISTS catalog_book_search')
+        schema_editor.execute(CREATE_SEARCH_TABLE.format(prefix=prefix))
+        schema_editor.execute(CONFIGURE_RANK)
+        schema_editor.execute(POPULATE_SEARCH_TABLE)
+    return recreate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_row_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_table('3'), recreate_search_table('2 3')),
+    ]
@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.urls import reverse 
-from django.db.models import UniqueConstraint 
+from django.db.models import UniqueConstraint, Q, F, Value, Count, Sum, Max, ExpressionWrapper, BooleanField, DateField, DurationField
 from django.db.models.functions import Lower
 import uuid
 from django.conf import settings
@@ -12,6 +12,9 @@ class Genre(models.Model):
         max_length=200,
         unique=True,
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every change, see catalog.versions
+    version = models.BigIntegerField(db_default=0, db_index=True, editable=False)
 
     def __str__(self):
         """String for representing the Model object."""
@@ -51,6 +54,17 @@ class Book(models.Model):
     
     language = models.ForeignKey(
         'Language', on_delete=models.SET_NULL, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every change, see catalog.versions
+    version = models.BigIntegerField(db_default=0, db_index=True, editable=False)
+
+    # Denormalized from the book's copies by catalog.book_counters, in the same transaction as every
+    # change to them, so lists can show availability without reading BookInstance.
+    # manage.py rebuild_book_counters repairs them after bulk inserts or any drift.
+    copies_total = models.IntegerField(default=0, editable=False)
+    copies_available = models.IntegerField(default=0, editable=False)
+    copies_on_loan = models.IntegerField(default=0, editable=False)
+    next_due_back = models.DateField(null=True, blank=True, editable=False)
 
     def __str__(self):
         """String for representing the Model object."""
@@ -65,6 +79,43 @@ class Book(models.Model):
         return ', '.join(genre.name for genre in self.genre.all()[:3]) 
     display_genre.short_description = 'Genre'
 
+class BookInstanceQuerySet(models.QuerySet):
+    """Loan state computed in SQL. A copy is overdue when it is on loan and its due date has passed."""
+
+    def overdue(self, today=None):
+        """Copies on loan past their due date."""
+        return self.filter(status='o', due_back__lt=today or date.today())
+
+    def with_overdue_flag(self, today=None):
+        """Annotates overdue_flag, which BookInstance.is_overdue returns instead of comparing dates per row."""
+        overdue = Q(status='o', due_back__lt=today or date.today())
+        return self.annotate(overdue_flag=ExpressionWrapper(overdue, output_field=BooleanField()))
+
+    def with_days_overdue(self, today=None):
+        """Annotates days_overdue, the time since the due date as a timedelta. Use on overdue() copies."""
+        return self.annotate(days_overdue=days_overdue_expression(today or date.today()))
+
+    def overdue_summary(self, today=None):
+        """Count, total and longest days overdue over the overdue copies, in one aggregate query."""
+        today = today or date.today()
+        days = days_overdue_expression(today)
+        totals = self.overdue(today).aggregate(
+            overdue_count=Count('pk'),
+            overdue_days_total=Sum(days),
+            overdue_days_max=Max(days),
+        )
+        return {
+            'overdue_count': totals['overdue_count'],
+            'overdue_days_total': totals['overdue_days_total'].days if totals['overdue_days_total'] else 0,
+            'overdue_days_max': totals['overdue_days_max'].days if totals['overdue_days_max'] else 0,
+        }
+
+
+def days_overdue_expression(today):
+    """today - due_back, evaluated by the database."""
+    return ExpressionWrapper(Value(today, output_field=DateField()) - F('due_back'), output_field=DurationField())
+
+
 class BookInstance(models.Model):
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4,
@@ -86,14 +137,32 @@ class BookInstance(models.Model):
         choices=LOAN_STATUS,
         blank=True,
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every change, see catalog.versions
+    version = models.BigIntegerField(db_default=0, db_index=True, editable=False)
+
+    objects = BookInstanceQuerySet.as_manager()
 
     class Meta:
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"),)
+        indexes = [
+            # Loan list (status='o' ORDER BY due_back) and the status='a' count on the home page
+            models.Index(fields=['status', 'due_back', 'id'], name='bookinstance_status_due_idx'),
+            # A user's loans, only indexing copies that are on loan
+            models.Index(fields=['borrower', 'due_back'], condition=Q(status='o'), name='bookinstance_borrower_loan_idx'),
+            # Default ordering of unfiltered BookInstance queries
+            models.Index(fields=['due_back', 'id'], name='bookinstance_due_back_idx'),
+        ]
 
     def __str__(self):
         """String for representing the Model object."""
         return f'{self.id}'
+
+    def save(self, *args, **kwargs):
+        """Saves the copy and, through signals, its book's copy counters in one transaction."""
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(BookInstance, instance=self)):
+            super().save(*args, **kwargs)
     
     def display_title(self):
         """Create a string for the Title. This is required to display Title in Admin."""
@@ -107,6 +176,9 @@ class BookInstance(models.Model):
     @property   
     def is_overdue(self):
         """Determines if the book is overdue based on due date and current date."""
+        # Annotated by BookInstance.objects.with_overdue_flag() on list querysets
+        if 'overdue_flag' in self.__dict__:
+            return self.overdue_flag
         return bool(self.due_back and date.today() > self.due_back)
     
 class Author(models.Model):
@@ -115,6 +187,9 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('Died', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every change, see catalog.versions
+    version = models.BigIntegerField(db_default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ['last_name', 'first_name']
@@ -131,6 +206,9 @@ class Language(models.Model):
     """Model representing a Language (e.g. English, French, Japanese, etc.)"""
     name = models.CharField(max_length=200,
                             unique=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every change, see catalog.versions
+    version = models.BigIntegerField(db_default=0, db_index=True, editable=False)
 
     def get_absolute_url(self):
         """Returns the url to access a particular language instance."""
@@ -139,3 +217,22 @@ class Language(models.Model):
     def __str__(self):
         """String for representing the Model object (in Admin site etc.)"""
         return self.name
+
+class OverdueReport(models.Model):
+    """Daily snapshot of overdue loans, counted by borrower and by book. Written by manage.py overdue_report."""
+    date = models.DateField(unique=True)
+    generated_at = models.DateTimeField(auto_now=True)
+    overdue_count = models.PositiveIntegerField(default=0)
+    overdue_days_total = models.PositiveIntegerField(default=0)
+    overdue_days_max = models.PositiveIntegerField(default=0)
+    # [{"borrower_id", "username", "count", "days", "max_days"}, ...], most overdue copies first
+    by_borrower = models.JSONField(default=list)
+    # [{"book_id", "title", "count", "days", "max_days"}, ...], most overdue copies first
+    by_book = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'Overdue report {self.date}'
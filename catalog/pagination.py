@@ -0,0 +1,275 @@
+from bisect import bisect_left, bisect_right
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from .db import estimated_row_count
+
+# Natural keyset ordering of each catalog model, always ending in a unique column
+KEYSET_ORDERINGS = {
+    'Author': ('last_name', 'first_name', 'id'),
+    'Book': ('id',),
+    'BookInstance': ('due_back', 'id'),
+    'Genre': ('id',),
+    'Language': ('id',),
+}
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+LIST_CURSOR_SALT = 'catalog.pagination.list-cursor'
+
+# Tables at least this large are counted from planner statistics by EstimatedCountPaginator
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'CATALOG_ESTIMATED_COUNT_THRESHOLD', 100_000)
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator for admin changelists of large tables. Counting an unfiltered list reads the
+    planner's row estimate instead of running COUNT(*) over the whole table, once the
+    table is past ESTIMATED_COUNT_THRESHOLD. Filtered lists are counted exactly.
+    '''
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class KeysetPage:
+    '''One page of a keyset paginated queryset. Never knows the total count.'''
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    '''
+    Paginates a queryset by seeking past the last row seen instead of using OFFSET.
+    Every page costs one indexed query no matter how deep it is.
+    Nullable columns are ordered NULLS FIRST so the seek condition is the same on every backend.
+    '''
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [queryset.model._meta.get_field(name) for name in self.ordering]
+
+    def page(self, cursor=None):
+        '''Returns the page after (or before) the position encoded in cursor.'''
+        queryset, reverse, values = self.page_queryset(cursor)
+        return self.build_page(list(queryset), reverse, values)
+
+    async def apage(self, cursor=None):
+        '''page() for async views, fetching the rows with the async ORM.'''
+        queryset, reverse, values = self.page_queryset(cursor)
+        return self.build_page([obj async for obj in queryset], reverse, values)
+
+    def page_queryset(self, cursor):
+        '''The query for one page, with one row over per_page to tell whether there is more.'''
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        reverse = direction == 'prev'
+
+        queryset = self.queryset.order_by(*self.order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self.seek(values, reverse))
+        return queryset[:self.per_page + 1], reverse, values
+
+    def build_page(self, rows, reverse, values):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, None, None)
+
+        # Moving forwards there is always a previous page once a cursor was used,
+        # moving backwards there is always a next page.
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else values is not None
+        return KeysetPage(
+            rows,
+            self.encode_cursor('next', rows[-1]) if has_next else None,
+            self.encode_cursor('prev', rows[0]) if has_previous else None,
+        )
+
+    def order_by(self, reverse=False):
+        '''Order expressions for the keyset columns, NULLS FIRST when ascending.'''
+        expressions = []
+        for field in self.fields:
+            if reverse:
+                expressions.append(F(field.name).desc(nulls_last=True) if field.null else F(field.name).desc())
+            else:
+                expressions.append(F(field.name).asc(nulls_first=True) if field.null else F(field.name).asc())
+        return expressions
+
+    def seek(self, values, reverse=False):
+        '''Builds the row-value comparison (a, b, c) > (x, y, z) as a portable Q expression.'''
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.fields, values):
+            condition |= equal & self.compare(field, value, reverse)
+            equal &= Q(**{f'{field.name}__isnull': True}) if value is None else Q(**{field.name: value})
+        return condition
+
+    @staticmethod
+    def compare(field, value, reverse):
+        '''Strictly after (or before) a single value, with NULL sorting first.'''
+        if value is None:
+            return Q(pk__in=[]) if reverse else Q(**{f'{field.name}__isnull': False})
+        if reverse:
+            condition = Q(**{f'{field.name}__lt': value})
+            return condition | Q(**{f'{field.name}__isnull': True}) if field.null else condition
+        return Q(**{f'{field.name}__gt': value})
+
+    def encode_cursor(self, direction, obj):
+        '''Signed, opaque token holding the keyset values of obj.'''
+        values = [field.value_to_string(obj) if getattr(obj, field.attname) is not None else None
+                  for field in self.fields]
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        '''Reverses encode_cursor, raising Http404 for tampered or malformed tokens.'''
+        try:
+            direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            return direction, [
+                None if value is None else field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404('Invalid page cursor.')
+
+
+class ListKeysetPaginator(KeysetPaginator):
+    '''
+    KeysetPaginator over rows already in memory, e.g. a cached list, sorted by key(row).
+    key returns a tuple of JSON serializable values, unique per row, which cursors hold.
+    '''
+
+    def __init__(self, rows, per_page, key):
+        self.rows = list(rows)
+        self.per_page = int(per_page)
+        self.key = key
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        reverse = direction == 'prev'
+
+        keys = [self.key(row) for row in self.rows]
+        if values is not None and keys and not same_shape(values, keys[0]):
+            # Signed, but not a key of this list, its values may not even compare with the keys
+            raise Http404('Invalid page cursor.')
+        if reverse:
+            # Nearest first, like the descending query of KeysetPaginator
+            end = bisect_left(keys, values)
+            rows = self.rows[max(end - self.per_page - 1, 0):end][::-1]
+        else:
+            start = 0 if values is None else bisect_right(keys, values)
+            rows = self.rows[start:start + self.per_page + 1]
+        return self.build_page(rows, reverse, values)
+
+    def encode_cursor(self, direction, row):
+        return signing.dumps([direction, list(self.key(row))], salt=LIST_CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=LIST_CURSOR_SALT)
+            if direction not in ('next', 'prev') or not isinstance(values, list):
+                raise ValueError
+            return direction, tuple(values)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404('Invalid page cursor.')
+
+
+def same_shape(values, key):
+    '''Whether a decoded cursor has as many values as key, each of the same type.'''
+    return len(values) == len(key) and all(type(value) is type(part) for value, part in zip(values, key))
+
+
+class KeysetPaginationMixin:
+    '''
+    Opt-in keyset pagination for ListViews.
+    Enabled per view with keyset_pagination = True, or per request with a ?cursor= parameter.
+    '''
+    keyset_pagination = False
+    keyset_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_keyset_paginator(self, queryset, page_size):
+        return KeysetPaginator(queryset, page_size, self.get_keyset_ordering())
+
+    def uses_keyset_pagination(self):
+        return self.keyset_pagination or self.cursor_kwarg in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = self.get_keyset_paginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg) or None)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['keyset_paginated'] = self.get_paginate_by(self.object_list) is not None and self.uses_keyset_pagination()
+        return context
+
+
+async def apaginate(request, queryset, per_page, keyset_ordering=None, keyset_pagination=False, cursor_kwarg='cursor'):
+    '''
+    The pagination context a paginated ListView would build, for async views.
+    Keyset paginated when keyset_pagination is set or the request has a cursor, offset paginated otherwise.
+    '''
+    if keyset_pagination or cursor_kwarg in request.GET:
+        paginator = KeysetPaginator(queryset, per_page, keyset_ordering)
+        page = await paginator.apage(request.GET.get(cursor_kwarg) or None)
+        keyset_paginated = True
+    else:
+        if not queryset.ordered and keyset_ordering:
+            # Stable pages, the keyset ordering always ends in a unique column
+            queryset = queryset.order_by(*keyset_ordering)
+        paginator = Paginator(queryset, per_page)
+        # Count with the async ORM up front, Paginator.count is a cached_property
+        paginator.count = await queryset.acount()
+        page_number = request.GET.get('page') or 1
+        try:
+            page = paginator.page(paginator.num_pages if page_number == 'last' else int(page_number))
+        except (InvalidPage, ValueError):
+            raise Http404('Invalid page.')
+        page.object_list = [obj async for obj in page.object_list]
+        keyset_paginated = False
+
+    return {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'keyset_paginated': keyset_paginated,
+        'object_list': page.object_list,
+    }
@@ -0,0 +1,48 @@
+from .models import BookInstance
+
+# Per-model queryset shaping for the generic list views.
+# Keyed by model name, each entry lists the select_related / prefetch_related lookups
+# and the only() columns that list_generic.html actually renders.
+LIST_QUERYSET_OPTIMIZATIONS = {
+    'Author': {
+        'only': ('id', 'first_name', 'last_name'),
+    },
+    'Book': {
+        'select_related': ('author',),
+        'only': ('id', 'title', 'copies_total', 'copies_available', 'author__id', 'author__first_name', 'author__last_name'),
+    },
+    'BookInstance': {
+        'select_related': ('book',),
+        'only': ('id', 'imprint', 'due_back', 'book__id', 'book__title'),
+    },
+    'Genre': {
+        'only': ('id', 'name'),
+    },
+    'Language': {
+        'only': ('id', 'name'),
+    },
+}
+
+
+def optimize_queryset(queryset, optimizations):
+    '''Applies a registry entry to a queryset.'''
+    if optimizations.get('select_related'):
+        queryset = queryset.select_related(*optimizations['select_related'])
+    if optimizations.get('prefetch_related'):
+        queryset = queryset.prefetch_related(*optimizations['prefetch_related'])
+    if optimizations.get('only'):
+        queryset = queryset.only(*optimizations['only'])
+    return queryset
+
+
+def list_queryset(model):
+    '''Returns the shaped queryset used to list model, based on its name.'''
+    return optimize_queryset(model.objects.all(), LIST_QUERYSET_OPTIMIZATIONS.get(model.__name__, {}))
+
+
+def borrowed_copies():
+    '''Copies on loan, earliest due first, with the book, borrower and overdue flag the loan lists show.'''
+    return (
+        BookInstance.objects.filter(status__exact='o').select_related('book', 'borrower')
+        .with_overdue_flag().order_by('due_back')
+    )
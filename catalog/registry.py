@@ -0,0 +1,121 @@
+from dataclasses import dataclass, field
+from django.forms import modelform_factory
+from django.http import Http404
+from django.urls import reverse
+from .models import Author, Book, BookInstance, Genre, Language
+from .pagination import KEYSET_ORDERINGS
+from .querysets import LIST_QUERYSET_OPTIMIZATIONS, optimize_queryset
+
+# Models served by the generic list/create/update/delete views, with the fields
+# their create and update forms edit ('__all__' for every editable field).
+GENERIC_MODELS = {
+    Author: {
+        'create_fields': ['first_name', 'last_name', 'date_of_birth', 'date_of_death'],
+    },
+    Book: {
+        'create_fields': ['title', 'author', 'summary', 'isbn', 'genre', 'language'],
+    },
+    BookInstance: {
+        'create_fields': ['book', 'imprint', 'due_back', 'borrower', 'status'],
+        'update_fields': ['book', 'imprint', 'due_back', 'borrower', 'status'],
+    },
+    Genre: {
+        'create_fields': ['name'],
+    },
+    Language: {
+        'create_fields': ['name'],
+    },
+}
+
+GENERIC_TEMPLATES = {
+    'view': 'list_generic.html',
+    'add': 'form_generic.html',
+    'change': 'form_generic.html',
+    'delete': 'confirm_delete_generic.html',
+}
+
+
+@dataclass(frozen=True)
+class ModelEntry:
+    '''Everything the generic views need to know about one model, resolved once.'''
+    name: str
+    model: type
+    forms: dict
+    permissions: dict
+    list_optimizations: dict
+    keyset_ordering: tuple
+    templates: dict = field(default_factory=lambda: dict(GENERIC_TEMPLATES))
+
+    def list_queryset(self):
+        return optimize_queryset(self.model._default_manager.all(), self.list_optimizations)
+
+    @property
+    def cache_scope(self):
+        return f'list:{self.model._meta.model_name}'
+
+
+def build_entry(model, create_fields, update_fields='__all__'):
+    name = model.__name__
+    codename = model._meta.model_name
+    return ModelEntry(
+        name=name,
+        model=model,
+        forms={
+            'add': modelform_factory(model, fields=create_fields),
+            'change': modelform_factory(model, fields=update_fields),
+        },
+        permissions={action: f'catalog.{action}_{codename}' for action in ('view', 'add', 'change', 'delete')},
+        list_optimizations=LIST_QUERYSET_OPTIMIZATIONS.get(name, {}),
+        keyset_ordering=KEYSET_ORDERINGS[name],
+    )
+
+
+# Filled by CatalogConfig.ready(), keyed by lower case model name like apps.get_model() lookups
+registry = {}
+
+
+def build_registry():
+    '''Builds the entry of every generic model, called once when the app is ready.'''
+    registry.clear()
+    for model, options in GENERIC_MODELS.items():
+        registry[model._meta.model_name] = build_entry(model, **options)
+    return registry
+
+
+def get_entry(model_name):
+    '''Returns the registry entry for a model name from the URL, or raises Http404.'''
+    try:
+        return registry[model_name.lower()]
+    except KeyError:
+        raise Http404(f'No catalog model named {model_name!r}.')
+
+
+class RegisteredModelMixin:
+    '''
+    Resolves the model_name URL argument once per request through the registry,
+    and supplies the model, form class, permission and template for registry_action.
+    '''
+    registry_action = None
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.entry = get_entry(kwargs['model_name'])
+        self.model = self.entry.model
+
+    def get_form_class(self):
+        return self.entry.forms[self.registry_action]
+
+    def get_permission_required(self):
+        return [self.entry.permissions[self.registry_action]]
+
+    def get_template_names(self):
+        return [self.entry.templates[self.registry_action]]
+
+    def get_success_url(self):
+        # Go back to generic-list with model_name passed in
+        return reverse('generic-list', kwargs={'model_name': self.kwargs['model_name']})
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['model_name'] = self.kwargs['model_name']
+        return context
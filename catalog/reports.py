@@ -0,0 +1,49 @@
+import datetime
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from .models import BookInstance, OverdueReport, days_overdue_expression
+
+
+def overdue_groups(queryset, group_by, labels, today):
+    '''Overdue copies grouped in SQL, one dict per group with count, total and longest days overdue.'''
+    days = days_overdue_expression(today)
+    rows = (
+        queryset.values(*group_by)
+        .annotate(count=Count('pk'), days=Sum(days), max_days=Max(days))
+        .order_by('-count', *group_by)
+    )
+    return [
+        {
+            **{label: row[field] for label, field in zip(labels, group_by)},
+            'count': row['count'],
+            'days': row['days'].days if row['days'] else 0,
+            'max_days': row['max_days'].days if row['max_days'] else 0,
+        }
+        for row in rows
+    ]
+
+
+def build_overdue_report(today=None):
+    '''
+    Counts overdue loans by borrower and by book with two GROUP BY queries,
+    the totals are summed from the per-book groups.
+    '''
+    today = today or datetime.date.today()
+    overdue = BookInstance.objects.overdue(today).order_by()
+    by_borrower = overdue_groups(overdue, ('borrower_id', 'borrower__username'), ('borrower_id', 'username'), today)
+    by_book = overdue_groups(overdue, ('book_id', 'book__title'), ('book_id', 'title'), today)
+    return {
+        'overdue_count': sum(group['count'] for group in by_book),
+        'overdue_days_total': sum(group['days'] for group in by_book),
+        'overdue_days_max': max((group['max_days'] for group in by_book), default=0),
+        'by_borrower': by_borrower,
+        'by_book': by_book,
+    }
+
+
+def generate_overdue_report(today=None):
+    '''Builds and stores the report for today, replacing one generated earlier the same day.'''
+    today = today or datetime.date.today()
+    with transaction.atomic():
+        report, _ = OverdueReport.objects.update_or_create(date=today, defaults=build_overdue_report(today))
+    return report
@@ -0,0 +1,137 @@
+import contextvars
+import random
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Cookie keeping a client's reads on the primary for a while after it wrote,
+# so the page it is redirected to does not miss the write on a lagging replica.
+PIN_COOKIE_NAME = 'catalog_primary_pin'
+PIN_SECONDS = getattr(settings, 'CATALOG_REPLICA_PIN_SECONDS', 10)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Routing state of the current request, set by PrimaryPinningMiddleware.
+# A context variable follows async views into the threads their ORM calls run in.
+_request_state = contextvars.ContextVar('catalog_replica_state', default=None)
+
+
+class ReplicaState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+def read_replicas():
+    return getattr(settings, 'CATALOG_READ_REPLICAS', [])
+
+
+def replicas_lag():
+    '''Whether the read replicas can be behind the primary, not when they are its own database.'''
+    return getattr(settings, 'CATALOG_READ_REPLICAS_LAG', True)
+
+
+@contextmanager
+def pin_to_primary():
+    '''
+    Sends every read to the primary inside the block or decorated function,
+    e.g. to read back what was just written.
+    '''
+    outer = _request_state.get()
+    state = ReplicaState(pinned=True)
+    token = _request_state.set(state)
+    try:
+        yield
+    finally:
+        _request_state.reset(token)
+        if outer is not None and state.wrote:
+            outer.wrote = True
+
+
+def reads_from_replica():
+    '''Whether reads made now would go to a replica rather than the primary.'''
+    if not read_replicas() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return False
+    state = _request_state.get()
+    return state is None or not (state.pinned or state.wrote)
+
+
+class ReadWriteRouter:
+    '''
+    Writes go to the default connection, reads to one of CATALOG_READ_REPLICAS.
+    Reads stay on the primary while it has a transaction open, for the rest of a request
+    that wrote or is not a safe method, and for clients pinned after a recent write.
+    '''
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica():
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        if state is None:
+            return random.choice(read_replicas())
+        # One replica per request, so its reads are consistent with each other
+        if state.replica is None:
+            state.replica = random.choice(read_replicas())
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    '''
+    Tracks whether a request writes, and after it does, pins the client's reads to the
+    primary for CATALOG_REPLICA_PIN_SECONDS with a cookie. Does nothing without replicas.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not read_replicas():
+            return self.get_response(request)
+
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        if not read_replicas():
+            return await self.get_response(request)
+
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(response, state)
+
+    def request_state(self, request):
+        return ReplicaState(pinned=request.method not in SAFE_METHODS or PIN_COOKIE_NAME in request.COOKIES)
+
+    def pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE_NAME, '1', max_age=PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,146 @@
+import re
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Q
+from django.http import Http404
+from .models import Book
+from .pagination import KeysetPage, KeysetPaginator
+
+# FTS5 table created by migration 0007, one row per Book with rowid = Book.id.
+# It lives next to catalog_book, so its reads and writes go where the router sends Book's.
+SEARCH_TABLE = 'catalog_book_search'
+CURSOR_SALT = 'catalog.search.cursor'
+
+# Same projection as the migration, limited to a set of book ids
+INDEX_BOOKS_SQL = f"""
+INSERT INTO {SEARCH_TABLE}(rowid, title, summary, authors, genres, isbn)
+SELECT b.id, b.title, b.summary,
+       COALESCE(a.first_name || ' ' || a.last_name, ''),
+       COALESCE((SELECT group_concat(g.name, ' ') FROM catalog_book_genre bg
+                 JOIN catalog_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id), ''),
+       b.isbn
+FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+"""
+
+# Keeps each IN (...) list well under SQLite's bound parameter limit
+INDEX_CHUNK_SIZE = 500
+
+
+def search_enabled(using=DEFAULT_DB_ALIAS):
+    '''The FTS5 index only exists on SQLite.'''
+    return connections[using].vendor == 'sqlite'
+
+
+# Shorter words match exactly, a one or two letter prefix would expand to most of the vocabulary.
+# The table's prefix index (migration 0012) is built for this length only.
+MIN_PREFIX_LENGTH = 3
+
+
+def build_match_query(text):
+    '''Turns free text into an FTS5 query where every word is a quoted (prefix) term.'''
+    return ' '.join(
+        f'"{term}"*' if len(term) >= MIN_PREFIX_LENGTH else f'"{term}"'
+        for term in re.findall(r'\w+', text)
+    )
+
+
+def index_books(book_ids):
+    '''Re-indexes the given books, dropping entries for books that no longer exist.'''
+    using = router.db_for_write(Book)
+    if not search_enabled(using):
+        return
+    book_ids = list(book_ids)
+    with connections[using].cursor() as cursor:
+        for offset in range(0, len(book_ids), INDEX_CHUNK_SIZE):
+            chunk = book_ids[offset:offset + INDEX_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', chunk)
+            cursor.execute(f'{INDEX_BOOKS_SQL} WHERE b.id IN ({placeholders})', chunk)
+
+
+def rebuild_search_index():
+    '''Rebuilds the whole index in one INSERT ... SELECT pass.'''
+    using = router.db_for_write(Book)
+    if not search_enabled(using):
+        return
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(INDEX_BOOKS_SQL)
+
+
+def search_books(text, per_page=10, cursor=None):
+    '''
+    Ranked, prefix matching search over books.
+    Returns a KeysetPage seeking on (rank, id), so deep pages cost the same as the first.
+    '''
+    match = build_match_query(text)
+    if not match:
+        return KeysetPage([], None, None)
+    using = router.db_for_read(Book)
+    if not search_enabled(using):
+        return fallback_search_books(text, per_page, cursor)
+
+    direction, rank, book_id = decode_cursor(cursor) if cursor else ('next', None, None)
+    reverse = direction == 'prev'
+
+    sql = f'SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    params = [match]
+    if book_id is not None:
+        op = '<' if reverse else '>'
+        sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+        params += [rank, rank, book_id]
+    sql += ' ORDER BY rank DESC, rowid DESC' if reverse else ' ORDER BY rank, rowid'
+    sql += ' LIMIT %s'
+    params.append(per_page + 1)
+
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        hits = db_cursor.fetchall()
+
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+    if reverse:
+        hits.reverse()
+    if not hits:
+        return KeysetPage([], None, None)
+
+    # From the same database as the hits
+    books = Book.objects.using(using).select_related('author').in_bulk([hit[0] for hit in hits])
+    results = [books[hit[0]] for hit in hits if hit[0] in books]
+
+    (first_id, first_rank), (last_id, last_rank) = hits[0], hits[-1]
+    has_next = has_more if not reverse else True
+    has_previous = has_more if reverse else book_id is not None
+    return KeysetPage(
+        results,
+        encode_cursor('next', last_rank, last_id) if has_next else None,
+        encode_cursor('prev', first_rank, first_id) if has_previous else None,
+    )
+
+
+def fallback_search_books(text, per_page, cursor):
+    '''Unranked LIKE search for backends without FTS5, keyset paginated by id.'''
+    condition = Q()
+    for term in re.findall(r'\w+', text):
+        condition &= (
+            Q(title__icontains=term) | Q(summary__icontains=term) | Q(isbn__icontains=term)
+            | Q(author__first_name__icontains=term) | Q(author__last_name__icontains=term)
+            | Q(genre__name__icontains=term)
+        )
+    queryset = Book.objects.filter(pk__in=Book.objects.filter(condition).values('pk')).select_related('author')
+
+    return KeysetPaginator(queryset, per_page, ('id',)).page(cursor)
+
+
+def encode_cursor(direction, rank, book_id):
+    return signing.dumps([direction, rank, book_id], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    try:
+        direction, rank, book_id = signing.loads(cursor, salt=CURSOR_SALT)
+        if direction not in ('next', 'prev'):
+            raise ValueError
+        return direction, float(rank), int(book_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise Http404('Invalid page cursor.')
@@ -0,0 +1,262 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Book, Author, BookInstance, Genre, Language
+from .book_counters import apply_copy_changes
+from .caching import book_scopes, copy_scopes, bump_versions
+from .counters import invalidate_index_counters
+from .loan_summary import invalidate_loan_summaries
+from .search import index_books
+from .loans import loan_transitioned
+from .routers import pin_to_primary
+from .versions import next_version
+
+# Handlers that read rows right after they were written read them from the primary,
+# a replica may not have them yet.
+
+# Home page counters
+# Any saved or deleted Book, BookInstance, Author or Genre can change a counter.
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def index_counters_changed(sender, **kwargs):
+    # Clear now, and again once the transaction commits so a request that recomputed
+    # the counters mid-transaction cannot leave stale values behind.
+    invalidate_index_counters()
+    transaction.on_commit(invalidate_index_counters)
+
+@receiver(loan_transitioned)
+def index_counters_loan_changed(sender, action, **kwargs):
+    # Loan transitions are plain UPDATEs, only a renewal leaves the status counts alone
+    if action != 'renew':
+        index_counters_changed(sender)
+
+# Full-text search index
+# Each entry denormalizes the book's author and genre names, so changes to those re-index the book.
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@pin_to_primary()
+def book_search_changed(sender, instance, **kwargs):
+    index_books([instance.pk])
+
+@receiver(post_save, sender=Author)
+@pin_to_primary()
+def author_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        index_books(instance.book_set.values_list('pk', flat=True))
+
+@receiver(post_save, sender=Genre)
+@pin_to_primary()
+def genre_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        index_books(instance.book_set.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Genre)
+@pin_to_primary()
+def genre_search_pre_delete(sender, instance, **kwargs):
+    # The Book-Genre rows are gone by post_delete, so remember the books now
+    instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Genre)
+@pin_to_primary()
+def genre_search_deleted(sender, instance, **kwargs):
+    index_books(getattr(instance, '_search_book_ids', []))
+
+@receiver(m2m_changed, sender=Book.genre.through)
+@pin_to_primary()
+def book_genres_search_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # book.genre.add/remove/clear/set
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            index_books([instance.pk])
+    elif action == 'pre_clear':
+        # genre.book_set.clear() does not pass the affected books
+        instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        index_books(getattr(instance, '_search_book_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        index_books(pk_set)
+
+# Page and fragment cache versions
+# Each change bumps the scopes that showed the object before it and the ones showing it after,
+# e.g. a book moving to another author invalidates both authors' pages.
+def page_scopes(instance):
+    # Read from the database, so before a save these are the scopes of the old row
+    if isinstance(instance, Book):
+        return book_scopes([instance.pk])
+    if isinstance(instance, BookInstance):
+        return copy_scopes([instance.pk])
+    # Author, Genre and Language pages list their books, and the books show their names
+    name = type(instance).__name__.lower()
+    return {f'{name}:{instance.pk}', f'list:{name}'} | book_scopes(instance.book_set.values_list('pk', flat=True))
+
+def bump_page_scopes(scopes):
+    # Like the counters: bump now, and again once the transaction commits so a page rendered
+    # from the uncommitted state cannot be stored under the current versions.
+    scopes = set(scopes)
+    bump_versions(scopes)
+    transaction.on_commit(lambda: bump_versions(scopes))
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=BookInstance)
+@receiver(pre_save, sender=Author)
+@receiver(pre_save, sender=Genre)
+@receiver(pre_save, sender=Language)
+@receiver(pre_delete, sender=Book)
+@receiver(pre_delete, sender=BookInstance)
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+@pin_to_primary()
+def page_cache_before_change(sender, instance, **kwargs):
+    # Related rows may be gone by post_delete, and foreign keys may be changing
+    instance._page_cache_scopes = set() if instance._state.adding else page_scopes(instance)
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@pin_to_primary()
+def page_cache_saved(sender, instance, **kwargs):
+    name = sender.__name__.lower()
+    bump_page_scopes(page_scopes(instance) | getattr(instance, '_page_cache_scopes', set()) | {f'list:{name}'})
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def page_cache_deleted(sender, instance, **kwargs):
+    name = sender.__name__.lower()
+    bump_page_scopes(getattr(instance, '_page_cache_scopes', set()) | {f'{name}:{instance.pk}', f'list:{name}'})
+
+@receiver(loan_transitioned)
+def page_cache_loan_changed(sender, book_ids, **kwargs):
+    # A loan only changes its copy and its book's counters, shown on the book's page and the lists
+    bump_page_scopes({'list:bookinstance', 'list:book'} | {f'book:{pk}' for pk in book_ids})
+
+@receiver(m2m_changed, sender=Book.genre.through)
+@pin_to_primary()
+def book_genres_page_cache_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # book.genre.add/remove/clear/set, the book and every genre it moves in or out of
+        scopes = book_scopes([instance.pk]) | {f'genre:{pk}' for pk in pk_set or ()}
+    else:
+        # genre.book_set.add/remove/clear/set
+        book_ids = pk_set if pk_set is not None else instance.book_set.values_list('pk', flat=True)
+        scopes = {f'genre:{instance.pk}'} | book_scopes(book_ids)
+
+    if action.startswith('pre_'):
+        instance._page_cache_genre_scopes = scopes
+    else:
+        bump_page_scopes(scopes | getattr(instance, '_page_cache_genre_scopes', set()))
+
+# Book copy counters
+# Loan transitions move them in catalog.loans, copies saved or deleted through the ORM here.
+# BookInstance.save() and deletes are atomic, so the counters change in the same transaction.
+@receiver(pre_save, sender=BookInstance)
+@receiver(pre_delete, sender=BookInstance)
+@pin_to_primary()
+def copy_counters_before_change(sender, instance, raw=False, **kwargs):
+    # The borrower is read along, for the loan summaries below
+    instance._loaned_to = None
+    if raw or instance._state.adding:
+        instance._counted_as = None
+        return
+    row = BookInstance.objects.filter(pk=instance.pk).values_list('book_id', 'status', 'due_back', 'borrower_id').first()
+    instance._counted_as = row[:3] if row is not None else None
+    instance._loaned_to = row[3] if row is not None else None
+
+@receiver(post_save, sender=BookInstance)
+def copy_counters_saved(sender, instance, raw=False, **kwargs):
+    # Fixtures load their books' counters as they were dumped
+    if raw:
+        return
+    before = getattr(instance, '_counted_as', None)
+    after = (instance.book_id, instance.status, instance.due_back)
+    if before == after:
+        return
+    if before is None:
+        apply_copy_changes([(instance.book_id, None, instance.status)])
+    else:
+        apply_copy_changes([(before[0], before[1], None), (instance.book_id, None, instance.status)])
+
+@receiver(post_delete, sender=BookInstance)
+def copy_counters_deleted(sender, instance, **kwargs):
+    before = getattr(instance, '_counted_as', None)
+    if before is not None:
+        apply_copy_changes([(before[0], before[1], None)])
+
+# "My Borrowed" loan summaries
+# Only the borrowers whose loans changed lose their summary: the ones of a transition, of a copy
+# saved or deleted through the ORM before and after the change, and of a book that was renamed.
+def loan_summaries_changed(user_ids):
+    user_ids = set(user_ids) - {None}
+    if user_ids:
+        invalidate_loan_summaries(user_ids)
+        transaction.on_commit(lambda: invalidate_loan_summaries(user_ids))
+
+@receiver(loan_transitioned)
+def loan_summary_loan_changed(sender, borrower_ids, **kwargs):
+    loan_summaries_changed(borrower_ids)
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def loan_summary_copy_changed(sender, instance, **kwargs):
+    loan_summaries_changed({getattr(instance, '_loaned_to', None), instance.borrower_id})
+
+@receiver(post_save, sender=Book)
+@pin_to_primary()
+def loan_summary_book_changed(sender, instance, created, raw=False, **kwargs):
+    # The summaries show the titles of the books on loan
+    if not (created or raw):
+        loan_summaries_changed(
+            BookInstance.objects.filter(book=instance, status='o').values_list('borrower_id', flat=True)
+        )
+
+# Row versions and timestamps
+# Every save takes the next version of its table, updates do the same in their UPDATE.
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=BookInstance)
+@receiver(pre_save, sender=Author)
+@receiver(pre_save, sender=Genre)
+@receiver(pre_save, sender=Language)
+def version_before_save(sender, instance, raw=False, **kwargs):
+    # Fixtures keep the versions they were dumped with
+    if not raw:
+        instance.version = next_version(sender)
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+def version_after_save(sender, instance, using, **kwargs):
+    # Inserts return the version, updates leave the expression on the instance, read back what it produced
+    if hasattr(instance.version, 'resolve_expression'):
+        instance.refresh_from_db(using=using, fields=['version'])
+
+# A book's genres live in the join table, touch the books whose genres changed so versions,
+# timestamps and the JSON API's validators (catalog.api) see them change.
+@receiver(m2m_changed, sender=Book.genre.through)
+@pin_to_primary()
+def book_genres_touched(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        book_ids = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action == 'pre_clear':
+        # genre.book_set.clear() does not pass the affected books
+        instance._touched_book_ids = list(instance.book_set.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        book_ids = getattr(instance, '_touched_book_ids', [])
+    else:
+        book_ids = pk_set if action in ('post_add', 'post_remove') else []
+    if book_ids:
+        Book.objects.filter(pk__in=list(book_ids)).update(updated_at=timezone.now(), version=next_version(Book))
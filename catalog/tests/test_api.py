@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from catalog import loans
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.versions import next_version
+
+class JSONAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.language = Language.objects.create(name='English')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Horror')]
+        cls.books = [
+            Book.objects.create(title=f'Book {number}', summary='Summary', isbn=f'{number:013}', author=cls.author, language=cls.language)
+            for number in range(5)
+        ]
+        cls.books[0].genre.set(cls.genres)
+        cls.copy = BookInstance.objects.create(book=cls.books[0], imprint='Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_with_fields(self):
+        url = reverse('api-detail', args=['book', self.books[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['genre'], [genre.pk for genre in self.genres])
+        self.assertEqual(response.json()['author'], self.author.pk)
+        self.assertEqual(response.json()['copies_available'], 1)
+
+        response = self.client.get(url, {'fields': 'title,isbn'})
+        self.assertEqual(response.json(), {'title': 'Book 0', 'isbn': '0000000000000'})
+        self.assertEqual(self.client.get(url, {'fields': 'title,borrower'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api-detail', args=['book', 9999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api-detail', args=['bookinstance', 'nope'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api-detail', args=['bookinstance', self.copy.pk])).json()['status'], 'a')
+
+    def test_conditional_get(self):
+        url = reverse('api-detail', args=['book', self.books[0].pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        # Unchanged, answered from the row's version alone
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(timezone.now().timestamp() + 60))
+        self.assertEqual(response.status_code, 304)
+
+        # A different representation has a different ETag
+        self.assertNotEqual(self.client.get(url, {'fields': 'title'})['ETag'], etag)
+
+        # Loans move the book's counters, genre changes its join table rows
+        loans.borrow(self.copy.pk, None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['copies_available'], 0)
+
+        etag = response['ETag']
+        self.books[0].genre.remove(self.genres[1])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['genre'], [self.genres[0].pk])
+
+    def test_list_keyset_pages(self):
+        url = reverse('api-list', args=['book'])
+        response = self.client.get(url, {'limit': 2, 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': book.pk} for book in self.books[:2]])
+        self.assertIsNone(response.json()['previous'])
+
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(response.json()['results'], [{'id': book.pk} for book in self.books[2:4]])
+        etag = response['ETag']
+
+        # The page's keyset columns and versions only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(response.wsgi_request.get_full_path(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Book.objects.filter(pk=self.books[3].pk).update(title='Renamed', version=next_version(Book))
+        self.assertEqual(self.client.get(response.wsgi_request.get_full_path(), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'tampered'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api-list', args=['user'])).status_code, 404)
+
+    def test_batched_lookup(self):
+        ids = f'{self.books[3].pk},9999,{self.books[1].pk}'
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api-list', args=['book']), {'ids': ids, 'fields': 'id,title,genre'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.books[3].pk, self.books[1].pk])
+        self.assertEqual(response.json()['missing'], [9999])
+
+        response = self.client.get(reverse('api-list', args=['book']), {'ids': ids, 'fields': 'id,title,genre'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('api-list', args=['book']), {'ids': 'a,b'}).status_code, 400)
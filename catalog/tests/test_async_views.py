@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from catalog import async_views
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+@override_settings(ROOT_URLCONF='locallibrary.urls_async')
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.language = Language.objects.create(name='English')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=cls.author, language=cls.language)
+        cls.book.genre.set([cls.genre])
+        cls.user = get_user_model().objects.create_user(username='librarian', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(codename='delete_author'))
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o', borrower=cls.user)
+        BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_async_views_are_routed(self):
+        match = self.client.get(reverse('index')).resolver_match
+        self.assertIs(match.func, async_views.index)
+
+    async def test_index(self):
+        response = await self.async_client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_books'], 1)
+        self.assertEqual(response.context['num_visits'], 0)
+
+        await self.async_client.alogin(username='librarian', password='1X<ISRUkw+tuK')
+        response = await self.async_client.get(reverse('index'))
+        self.assertContains(response, 'librarian')
+        self.assertEqual(response.context['num_visits'], 1)
+
+    async def test_generic_lists(self):
+        for model_name in ['Author', 'Book', 'BookInstance', 'Genre', 'Language']:
+            with self.subTest(model_name=model_name):
+                response = await self.async_client.get(reverse('generic-list', kwargs={'model_name': model_name}))
+                self.assertEqual(response.status_code, 200)
+                self.assertTemplateUsed(response, 'list_generic.html')
+        response = await self.async_client.get(reverse('generic-list', kwargs={'model_name': 'Book'}), {'cursor': ''})
+        self.assertContains(response, 'Book Title')
+        self.assertTrue(response.context['keyset_paginated'])
+        response = await self.async_client.get(reverse('generic-list', kwargs={'model_name': 'Unknown'}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_views(self):
+        for obj in [self.book, self.author, self.genre, self.language, self.copy]:
+            with self.subTest(model=type(obj).__name__):
+                response = await self.async_client.get(obj.get_absolute_url())
+                self.assertContains(response, 'Book Title')
+        response = await self.async_client.get(reverse('book-detail', kwargs={'pk': 999}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_views_logged_in(self):
+        await self.async_client.alogin(username='librarian', password='1X<ISRUkw+tuK')
+        response = await self.async_client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'Borrow')
+        response = await self.async_client.get(self.author.get_absolute_url())
+        self.assertNotContains(response, 'Delete Author')
+        self.assertContains(response, 'librarian')
+
+    def test_book_detail_fragment_hit_skips_genres_and_copies(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as miss:
+            self.assertContains(self.client.get(self.book.get_absolute_url()), 'Fantasy')
+        with CaptureQueriesContext(connection) as hit:
+            response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'Fantasy')
+        self.assertContains(response, 'Borrow')
+        self.assertEqual(len(hit), len(miss) - 2)
+
+    async def test_loan_lists(self):
+        response = await self.async_client.get(reverse('my-borrowed'))
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.alogin(username='librarian', password='1X<ISRUkw+tuK')
+        for name in ['borrowed', 'my-borrowed']:
+            with self.subTest(name=name):
+                response = await self.async_client.get(reverse(name))
+                self.assertContains(response, 'Book Title')
+                self.assertEqual(len(response.context['bookinstance_list']), 1)
@@ -0,0 +1,38 @@
+import copy
+from django.test import TestCase
+from catalog.benchmarks import runner
+from catalog.benchmarks.scenarios import SCENARIOS, BenchmarkContext
+from catalog.benchmarks.seed import seed
+from catalog.models import Book, BookInstance
+
+class BenchmarkSuiteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(books=20, instances=200, users=5, log=lambda message: None)
+
+    def test_seed_is_reproducible_in_shape(self):
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(BookInstance.objects.count(), 200)
+        self.assertFalse(BookInstance.objects.filter(status='o', borrower=None).exists())
+
+    def test_every_scenario_runs_without_errors(self):
+        context = BenchmarkContext(iterations=2)
+        results = runner.run_sequential(SCENARIOS, context, requests=2)
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_per_request'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {
+            'scenarios': {'index': {'latency_ms': {'p95': 10.0}, 'queries_per_request': 2}},
+            'load': {'wsgi': {'throughput_rps': 100.0}},
+        }
+        self.assertEqual(runner.compare(baseline, baseline, 0.2), [])
+
+        current = copy.deepcopy(baseline)
+        current['scenarios']['index']['latency_ms']['p95'] = 13.0
+        current['scenarios']['index']['queries_per_request'] = 3
+        current['load']['wsgi']['throughput_rps'] = 70.0
+        self.assertEqual(len(runner.compare(current, baseline, 0.2)), 3)
@@ -0,0 +1,92 @@
+import datetime
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from catalog import loans
+from catalog.book_counters import drifted_books, rebuild_book_counters
+from catalog.models import Book, BookInstance
+
+TODAY = datetime.date.today()
+
+class BookCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        cls.other_book = Book.objects.create(title='Other Title', summary='Summary', isbn='HIJKLMN')
+        cls.user = get_user_model().objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.copies = [BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a') for _ in range(3)]
+        BookInstance.objects.create(book=cls.book, imprint='Imprint', status='m')
+
+    def assertCounters(self, book, total, available, on_loan, next_due_back=None):
+        book.refresh_from_db()
+        self.assertEqual(
+            (book.copies_total, book.copies_available, book.copies_on_loan, book.next_due_back),
+            (total, available, on_loan, next_due_back),
+        )
+
+    def test_created_copies_are_counted(self):
+        self.assertCounters(self.book, 4, 3, 0)
+        self.assertCounters(self.other_book, 0, 0, 0)
+
+    def test_loan_transitions(self):
+        first, second = self.copies[0].pk, self.copies[1].pk
+        loans.borrow(first, self.user, TODAY + datetime.timedelta(days=10))
+        loans.borrow(second, self.user, TODAY + datetime.timedelta(days=5))
+        self.assertCounters(self.book, 4, 1, 2, TODAY + datetime.timedelta(days=5))
+
+        loans.renew(second, TODAY + datetime.timedelta(days=20))
+        self.assertCounters(self.book, 4, 1, 2, TODAY + datetime.timedelta(days=10))
+
+        loans.return_copy(first)
+        self.assertCounters(self.book, 4, 2, 1, TODAY + datetime.timedelta(days=20))
+
+    def test_refused_transition_leaves_counters(self):
+        loans.borrow(self.copies[0].pk, self.user)
+        self.assertFalse(loans.borrow(self.copies[0].pk, self.user).ok)
+        self.assertCounters(self.book, 4, 2, 1, TODAY + loans.LOAN_PERIOD)
+
+    def test_bulk_transitions(self):
+        pks = [copy.pk for copy in self.copies]
+        loans.bulk_mark_maintenance(pks[:2])
+        self.assertCounters(self.book, 4, 1, 0)
+
+    def test_saves_and_deletes(self):
+        copy = self.copies[0]
+        copy.book = self.other_book
+        copy.status = 'o'
+        copy.due_back = TODAY
+        copy.save()
+        self.assertCounters(self.book, 3, 2, 0)
+        self.assertCounters(self.other_book, 1, 0, 1, TODAY)
+
+        copy.delete()
+        self.assertCounters(self.other_book, 0, 0, 0)
+        BookInstance.objects.filter(book=self.book, status='m').delete()
+        self.assertCounters(self.book, 2, 2, 0)
+
+    def test_rebuild_repairs_drift(self):
+        Book.objects.filter(pk=self.book.pk).update(copies_total=0, copies_available=7, next_due_back=TODAY)
+        self.assertEqual(list(drifted_books()), [self.book])
+        self.assertEqual(rebuild_book_counters(), 1)
+        self.assertCounters(self.book, 4, 3, 0)
+        self.assertFalse(drifted_books().exists())
+
+    def test_rebuild_command(self):
+        Book.objects.filter(pk=self.other_book.pk).update(copies_on_loan=2)
+        out = StringIO()
+        call_command('rebuild_book_counters', '--dry-run', stdout=out)
+        self.assertIn('1 books have drifted', out.getvalue())
+        call_command('rebuild_book_counters', str(self.other_book.pk), stdout=out)
+        self.assertIn('Repaired the counters of 1 books', out.getvalue())
+        self.assertCounters(self.other_book, 0, 0, 0)
+
+    def test_book_list_shows_availability(self):
+        cache.clear()
+        response = self.client.get(reverse('generic-list', kwargs={'model_name': 'Book'}))
+        self.assertContains(response, '(3 of 4 available)')
+        loans.borrow(self.copies[0].pk, self.user)
+        response = self.client.get(reverse('generic-list', kwargs={'model_name': 'Book'}))
+        self.assertContains(response, '(2 of 4 available)')
@@ -0,0 +1,113 @@
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from catalog import loans
+from catalog.caching import cache_version
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.language = Language.objects.create(name='English')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=cls.author, language=cls.language)
+        cls.book.genre.set([cls.genre])
+        cls.other_book = Book.objects.create(title='Other Title', summary='Summary', isbn='HIJKLMN', author=cls.author, language=cls.language)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+        cls.user = get_user_model().objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_served_from_cache(self):
+        url = self.book.get_absolute_url()
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+
+    def test_borrow_only_invalidates_its_book(self):
+        scopes = {
+            'book': [f'book:{self.book.pk}'],
+            'other_book': [f'book:{self.other_book.pk}'],
+            'author': [f'author:{self.author.pk}'],
+            'copies': ['list:bookinstance'],
+        }
+        before = {name: cache_version(scope) for name, scope in scopes.items()}
+        loans.borrow(self.copy.pk, self.user)
+        after = {name: cache_version(scope) for name, scope in scopes.items()}
+
+        self.assertNotEqual(before['book'], after['book'])
+        self.assertNotEqual(before['copies'], after['copies'])
+        self.assertEqual(before['other_book'], after['other_book'])
+        self.assertEqual(before['author'], after['author'])
+
+    def test_borrow_refreshes_book_page(self):
+        url = self.book.get_absolute_url()
+        self.assertContains(self.client.get(url), 'Available: 1')
+        loans.borrow(self.copy.pk, self.user)
+        self.assertContains(self.client.get(url), 'On loan: 1')
+
+    def test_genre_rename_refreshes_book_and_author_pages(self):
+        book_url = self.book.get_absolute_url()
+        author_url = self.author.get_absolute_url()
+        self.client.get(book_url)
+        self.client.get(author_url)
+        self.genre.name = 'Science Fiction'
+        self.genre.save()
+        self.assertContains(self.client.get(book_url), 'Science Fiction')
+        self.assertContains(self.client.get(author_url), 'Science Fiction')
+
+    def test_genre_change_refreshes_both_genre_pages(self):
+        horror = Genre.objects.create(name='Horror')
+        fantasy_url = self.genre.get_absolute_url()
+        horror_url = horror.get_absolute_url()
+        self.assertContains(self.client.get(fantasy_url), 'Book Title')
+        self.assertNotContains(self.client.get(horror_url), 'Book Title')
+        self.book.genre.set([horror])
+        self.assertNotContains(self.client.get(fantasy_url), 'Book Title')
+        self.assertContains(self.client.get(horror_url), 'Book Title')
+
+    def test_moving_book_refreshes_old_author(self):
+        old_author_url = self.author.get_absolute_url()
+        self.assertContains(self.client.get(old_author_url), 'Other Title')
+        self.other_book.author = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.other_book.save()
+        self.assertNotContains(self.client.get(old_author_url), 'Other Title')
+
+    def test_list_refreshes_on_create(self):
+        url = reverse('generic-list', kwargs={'model_name': 'Genre'})
+        self.assertNotContains(self.client.get(url), 'Horror')
+        Genre.objects.create(name='Horror')
+        self.assertContains(self.client.get(url), 'Horror')
+
+    def test_copy_changes_refresh_book_list_counters(self):
+        url = reverse('generic-list', kwargs={'model_name': 'Book'})
+        self.assertContains(self.client.get(url), '(1 of 1 available)')
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertContains(self.client.get(url), '(2 of 2 available)')
+        copy.status = 'm'
+        copy.save()
+        self.assertContains(self.client.get(url), '(1 of 2 available)')
+        copy.delete()
+        self.assertContains(self.client.get(url), '(1 of 1 available)')
+
+    def test_logged_in_users_get_fragments(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        url = self.book.get_absolute_url()
+        self.assertContains(self.client.get(url), 'Borrow')
+        # Session, user, book and the two permission lookups, genres and copies come from the cached fragment
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, 'Borrow')
+        self.assertContains(response, 'reader')
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='catalog-cache-'),
+}})
+class FileBasedPageCacheTest(PageCacheTest):
+    pass
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import resolve
+from catalog.context_processors import active_nav, navigation
+from catalog.models import Author
+
+class NavigationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.librarian = User.objects.create(username='librarian')
+        cls.librarian.user_permissions.add(
+            Permission.objects.get(codename='can_mark_returned'),
+            Permission.objects.get(codename='add_book'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_active_nav_from_url_name(self):
+        for path, expected in [
+            ('/catalog/', 'home'),
+            ('/catalog/Book/', 'book'),
+            ('/catalog/book/1', 'book'),
+            ('/catalog/Author/', 'author'),
+            ('/catalog/Author/create/', 'add-author'),
+            ('/catalog/BookInstance/', 'bookinstance'),
+            ('/catalog/books/borrowed/', 'borrowed'),
+            ('/catalog/search/', 'search'),
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(active_nav(resolve(path)), expected)
+        self.assertIsNone(active_nav(None))
+
+    def test_permissions_resolved_once(self):
+        request = RequestFactory().get('/catalog/')
+        request.user = User.objects.get(pk=self.librarian.pk)
+        request.resolver_match = resolve('/catalog/')
+        with self.assertNumQueries(2):
+            perms = navigation(request)['nav']['perms']
+        self.assertTrue(perms['can_mark_returned'])
+        self.assertTrue(perms['add_book'])
+        self.assertFalse(perms['add_author'])
+
+    def test_sidebar_marks_active_entry(self):
+        response = self.client.get(f'/catalog/author/{self.author.pk}')
+        self.assertEqual(response.context['nav']['active'], 'author')
+        self.assertNotContains(response, 'href="/catalog/books/borrowed/"')
+
+        self.client.force_login(self.librarian)
+        response = self.client.get('/catalog/Book/create/')
+        self.assertEqual(response.context['nav']['active'], 'add-book')
+        self.assertContains(response, 'href="/catalog/books/borrowed/"')
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from catalog.counters import compute_index_counters, get_index_counters
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.visits import VISITS_COOKIE_NAME
+
+class IndexCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(name='English')
+        Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='The Book', summary='Summary', isbn='ABCDEFG', author=author, language=language)
+        Book.objects.create(title='A Second Book', summary='Summary', isbn='HIJKLMN', author=author, language=language)
+        BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_match_querysets(self):
+        self.assertEqual(compute_index_counters(), {
+            'num_books': 2,
+            'num_instances': 2,
+            'num_instances_available': 1,
+            'num_authors': 1,
+            'num_genres': 1,
+            'num_books_with_the': 1,
+        })
+
+    def test_counters_use_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            compute_index_counters()
+        self.assertEqual(len(queries), 1)
+
+    def test_cached_counters_use_no_queries(self):
+        get_index_counters()
+        with self.assertNumQueries(0):
+            get_index_counters()
+
+    def test_save_invalidates_cache(self):
+        self.assertEqual(get_index_counters()['num_instances_available'], 1)
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertEqual(get_index_counters()['num_instances_available'], 2)
+
+    def test_delete_invalidates_cache(self):
+        self.assertEqual(get_index_counters()['num_genres'], 1)
+        Genre.objects.all().delete()
+        self.assertEqual(get_index_counters()['num_genres'], 0)
+
+    def test_index_view_context(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_books'], 2)
+        self.assertEqual(response.context['num_books_with_the'], 1)
+
+class VisitCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_visits_are_counted_in_a_cookie(self):
+        for expected in range(3):
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], expected)
+        self.assertNotIn('sessionid', self.client.cookies)
+
+    def test_index_does_not_write(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'))
+        self.assertFalse([query['sql'] for query in queries if not query['sql'].startswith('SELECT')])
+
+    def test_tampered_cookie_restarts_count(self):
+        self.client.cookies[VISITS_COOKIE_NAME] = '41'
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 0)
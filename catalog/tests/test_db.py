@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from catalog.db import sqlite_pragma_statements
+from catalog.models import Book, BookInstance, Genre
+from catalog.routers import PIN_COOKIE_NAME, ReadWriteRouter, pin_to_primary
+from catalog.search import search_books
+
+
+class SqlitePragmaTest(TestCase):
+    def test_statements_keep_order(self):
+        self.assertEqual(
+            sqlite_pragma_statements({'journal_mode': 'WAL', 'cache_size': -2048}),
+            ['PRAGMA journal_mode = WAL', 'PRAGMA cache_size = -2048'],
+        )
+
+    @override_settings(CATALOG_SQLITE_PRAGMAS={'default': {'cache_size': -4321}})
+    def test_pragmas_applied_on_connect(self):
+        # A fresh connection to the same test database, not the one the test transaction holds
+        new_connection = connection.copy()
+        try:
+            with new_connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -4321)
+        finally:
+            new_connection.close()
+
+
+@override_settings(CATALOG_READ_REPLICAS=['reader'])
+class ReadWriteRouterTest(SimpleTestCase):
+    router = ReadWriteRouter()
+
+    def test_reads_go_to_replica_outside_transactions(self):
+        self.assertEqual(self.router.db_for_read(Book), 'reader')
+
+    def test_reads_stay_on_primary_inside_transactions(self):
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_reads_stay_on_primary_when_pinned(self):
+        with pin_to_primary():
+            self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    @override_settings(CATALOG_READ_REPLICAS=[])
+    def test_reads_use_primary_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_writes_and_migrations_use_default(self):
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'catalog'))
+        self.assertFalse(self.router.allow_migrate('reader', 'catalog'))
+
+
+@override_settings(CATALOG_READ_REPLICAS=['replica'], CATALOG_READ_REPLICAS_LAG=True, DATABASE_ROUTERS=['catalog.routers.ReadWriteRouter'])
+class ReplicaRoutingTest(TransactionTestCase):
+    '''
+    The test database as the primary and a replica in its own SQLite file, which only
+    sees the primary's rows when sync_replica() copies them over, like a lagging replica.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the test runner has set up its databases, it never creates or migrates this one
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        cls.original_databases = cls.databases
+        cls.databases = {*cls.databases, 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+        super().tearDownClass()
+        cls.databases = cls.original_databases
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title='Replica Title', summary='Summary', isbn='ABCDEFG')
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.user = get_user_model().objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        with pin_to_primary():
+            self.client.force_login(self.user)
+        self.sync_replica()
+
+    def sync_replica(self):
+        connections['replica'].close()
+        connections['default'].ensure_connection()
+        target = sqlite3.connect(connections['replica'].settings_dict['NAME'])
+        try:
+            connections['default'].connection.backup(target)
+        finally:
+            target.close()
+
+    def test_reads_use_the_replica(self):
+        genre = Genre.objects.create(name='Fantasy')
+        self.assertFalse(Genre.objects.filter(pk=genre.pk).exists())
+        self.sync_replica()
+        self.assertTrue(Genre.objects.filter(pk=genre.pk).exists())
+
+    def test_search_reads_from_the_replica(self):
+        self.book.title = 'Dragonflight'
+        self.book.save()
+        # The replica's index still has the old title
+        self.assertEqual(list(search_books('dragonflight')), [])
+        self.assertEqual(list(search_books('replica')), [self.book])
+        self.sync_replica()
+        self.assertEqual(list(search_books('dragonflight')), [self.book])
+
+    def test_views_read_from_the_replica(self):
+        genre = Genre.objects.create(name='Fantasy')
+        self.assertEqual(self.client.get(reverse('genre-detail', args=[genre.pk])).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('generic-list', args=['genre'])), 'Fantasy')
+        self.sync_replica()
+        self.assertEqual(self.client.get(reverse('genre-detail', args=[genre.pk])).status_code, 200)
+        # The list fragment rendered from the lagging replica was not cached
+        self.assertContains(self.client.get(reverse('generic-list', args=['genre'])), 'Fantasy')
+
+    def test_cached_pages_are_rendered_from_the_primary(self):
+        self.client.logout()
+        Genre.objects.create(name='Fantasy')
+        self.assertContains(self.client.get(reverse('generic-list', args=['genre'])), 'Fantasy')
+        # Now served from the page cache
+        with self.assertNumQueries(0, using='default'), self.assertNumQueries(0, using='replica'):
+            self.assertContains(self.client.get(reverse('generic-list', args=['genre'])), 'Fantasy')
+
+    def test_borrow_redirect_reads_its_write(self):
+        response = self.client.post(reverse('borrow-book', args=[self.copy.pk]))
+        self.assertRedirects(response, reverse('my-borrowed'), fetch_redirect_response=False)
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        # The replica has not seen the loan, the pinned redirect reads it from the primary
+        self.assertContains(self.client.get(reverse('my-borrowed')), 'Replica Title')
+
+        # The loan summary behind the page is always read from the primary and cached, pinned or not
+        del self.client.cookies[PIN_COOKIE_NAME]
+        self.assertContains(self.client.get(reverse('my-borrowed')), 'Replica Title')
+        cache.clear()
+        self.assertContains(self.client.get(reverse('my-borrowed')), 'Replica Title')
+
+        # Other pages still read the lagging replica
+        self.assertContains(self.client.get(reverse('book-detail', args=[self.book.pk])), reverse('borrow-book', args=[self.copy.pk]))
+
+    def test_safe_requests_without_writes_are_not_pinned(self):
+        response = self.client.get(reverse('book-detail', args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
@@ -0,0 +1,115 @@
+import csv
+import datetime
+import io
+import json
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from catalog import loans
+from catalog.export import export_rows
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+User = get_user_model()
+
+class CatalogExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(*Permission.objects.filter(codename__in=['view_book', 'view_bookinstance']))
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(name='English')
+        cls.books = []
+        for i in range(5):
+            book = Book.objects.create(title=f'Title {i}', summary='Summary', isbn=f'ISBN{i}', author=author, language=language)
+            book.genre.set([Genre.objects.create(name=f'Genre {i}'), Genre.objects.get_or_create(name='Shared')[0]])
+            cls.books.append(book)
+        cls.copy = BookInstance.objects.create(book=cls.books[0], imprint='Imprint', status='a')
+
+    def test_book_rows_are_denormalized_across_chunks(self):
+        rows = list(export_rows('Book', chunk_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0][1], 'Title 0')
+        self.assertEqual(rows[0][5:9], ('John', 'Smith', 'English', 'Genre 0; Shared'))
+        self.assertEqual(rows[4][8], 'Genre 4; Shared')
+
+    def test_export_queries_do_not_grow_with_rows(self):
+        # One query for the rows and one for the genres of each chunk
+        with self.assertNumQueries(3):
+            list(export_rows('Book', chunk_size=3))
+
+    def test_csv_view(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('export', kwargs={'model_name': 'Book'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['author_last_name'], 'Smith')
+        self.assertEqual(rows[0]['genres'], 'Genre 0; Shared')
+
+    def test_ndjson_updated_since(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        since = timezone.now()
+        BookInstance.objects.create(book=self.books[1], imprint='Imprint', status='a')
+        loans.borrow(self.copy.pk, self.user)
+
+        response = self.client.get(
+            reverse('export', kwargs={'model_name': 'BookInstance'}),
+            {'format': 'ndjson', 'since': since.isoformat()},
+        )
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({(row['status'], row['borrower']) for row in rows}, {('a', None), ('o', 'testuser1')})
+
+    def test_updated_since_follows_denormalized_names(self):
+        since = timezone.now()
+        self.assertEqual(list(export_rows('Book', since)), [])
+
+        author = Author.objects.get()
+        author.last_name = 'Smythe'
+        author.save()
+        self.assertEqual([row[6] for row in export_rows('Book', since)], ['Smythe'] * 5)
+
+        since = timezone.now()
+        genre = Genre.objects.get(name='Genre 2')
+        genre.name = 'Renamed'
+        genre.save()
+        rows = list(export_rows('Book', since))
+        self.assertEqual([row[0] for row in rows], [self.books[2].pk])
+        self.assertEqual(rows[0][8], 'Renamed; Shared')
+
+        since = timezone.now()
+        self.books[0].title = 'Retitled'
+        self.books[0].save()
+        self.assertEqual([row[2] for row in export_rows('BookInstance', since)], ['Retitled'])
+
+    async def test_asgi_streams_asynchronously(self):
+        await self.async_client.alogin(username='testuser1', password='1X<ISRUkw+tuK')
+        response = await self.async_client.get(reverse('export', kwargs={'model_name': 'Book'}), {'format': 'ndjson'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)['title'] for line in content.decode().splitlines()], [f'Title {i}' for i in range(5)])
+
+    def test_permission_and_validation(self):
+        response = self.client.get(reverse('export', kwargs={'model_name': 'Book'}))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('export', kwargs={'model_name': 'Author'})).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export', kwargs={'model_name': 'Nope'})).status_code, 404)
+        response = self.client.get(reverse('export', kwargs={'model_name': 'Book'}), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command('export_catalog', 'Genre', '--format', 'ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+
+        out = io.StringIO()
+        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        call_command('export_catalog', 'Genre', '--since', tomorrow, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['id,name,updated_at'])
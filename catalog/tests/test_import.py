@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import tempfile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from catalog.book_counters import drifted_books
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+class ImportCatalogTest(TestCase):
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as output:
+            output.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, path, *args):
+        out = io.StringIO()
+        call_command('import_catalog', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_import_resolves_natural_keys(self):
+        Genre.objects.create(name='Fantasy')
+        path = self.write('.csv', (
+            'title,summary,isbn,author_first_name,author_last_name,language,genres,copies,imprint\n'
+            'The Hobbit,Summary,111,John,Tolkien,English,fantasy; Adventure; FANTASY,3,Allen\n'
+            'The Silmarillion,Summary,222,John,Tolkien,English,Fantasy,1,Allen\n'
+            'Dune,Summary,333,Frank,Herbert,,Science Fiction,0,\n'
+        ))
+        output = self.import_file(path, '--chunk-size', '2')
+
+        self.assertIn('Imported 3 books and 4 copies', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Language.objects.count(), 1)
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)), ['Adventure', 'Fantasy', 'Science Fiction'])
+        hobbit = Book.objects.get(isbn='111')
+        self.assertEqual(str(hobbit.author), 'Tolkien, John')
+        self.assertEqual(sorted(g.name for g in hobbit.genre.all()), ['Adventure', 'Fantasy'])
+        self.assertEqual(hobbit.bookinstance_set.filter(status='a', imprint='Allen').count(), 3)
+        self.assertEqual((hobbit.copies_total, hobbit.copies_available), (3, 3))
+        self.assertFalse(drifted_books().exists())
+        self.assertIsNone(Book.objects.get(isbn='333').language)
+
+    def test_rerun_skips_existing_isbns(self):
+        path = self.write('.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'title': 'A', 'isbn': '1', 'author_first_name': 'X', 'author_last_name': 'Y', 'genres': ['G'], 'copies': 2},
+            {'title': 'B', 'isbn': '2', 'genres': [], 'copies': 1},
+        ]))
+        self.import_file(path)
+        output = self.import_file(path)
+
+        self.assertIn('Imported 0 books and 0 copies (2 existing ISBNs skipped)', output)
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(BookInstance.objects.count(), 3)
+        self.assertEqual(Book.genre.through.objects.count(), 1)
+
+    def test_import_reads_export(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Title', summary='Summary', isbn='ABC', author=author)
+        book.genre.set([Genre.objects.create(name='Horror'), Genre.objects.create(name='Comedy')])
+        path = self.write('.csv', '')
+        call_command('export_catalog', 'Book', '--output', path)
+
+        Book.objects.all().delete()
+        self.import_file(path)
+        book = Book.objects.get(isbn='ABC')
+        self.assertEqual(book.author, author)
+        self.assertEqual(sorted(g.name for g in book.genre.all()), ['Comedy', 'Horror'])
+
+    def test_import_invalidates_cached_pages(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Tolkien')
+        for url in (reverse('generic-list', args=['book']), reverse('generic-list', args=['genre']), author.get_absolute_url()):
+            self.assertNotContains(self.client.get(url), 'Fantasy')
+
+        path = self.write('.csv', (
+            'title,summary,isbn,author_first_name,author_last_name,language,genres,copies,imprint\n'
+            'The Hobbit,Summary,111,John,Tolkien,English,Fantasy,1,Allen\n'
+        ))
+        self.import_file(path)
+        self.assertContains(self.client.get(reverse('generic-list', args=['book'])), 'The Hobbit')
+        self.assertContains(self.client.get(reverse('generic-list', args=['genre'])), 'Fantasy')
+        self.assertContains(self.client.get(author.get_absolute_url()), 'The Hobbit')
@@ -0,0 +1,87 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from catalog import loans
+from catalog.loan_summary import get_loan_summary, loan_summary_key
+from catalog.models import Book, BookInstance
+
+TODAY = datetime.date.today()
+
+class LoanSummaryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.other = User.objects.create(username='other')
+        cls.book = Book.objects.create(title='First Book', summary='Summary', isbn='ABCDEFG')
+        cls.second = Book.objects.create(title='Second Book', summary='Summary', isbn='HIJKLMN')
+        cls.overdue = BookInstance.objects.create(
+            book=cls.book, imprint='Imprint', status='o', borrower=cls.reader, due_back=TODAY - datetime.timedelta(days=2),
+        )
+        BookInstance.objects.create(
+            book=cls.second, imprint='Imprint', status='o', borrower=cls.reader, due_back=TODAY + datetime.timedelta(days=5),
+        )
+        BookInstance.objects.create(
+            book=cls.book, imprint='Imprint', status='o', borrower=cls.other, due_back=TODAY + datetime.timedelta(days=1),
+        )
+        cls.available = BookInstance.objects.create(book=cls.second, imprint='Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            summary = get_loan_summary(self.reader)
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(summary.next_due_back, TODAY - datetime.timedelta(days=2))
+        self.assertEqual(summary.overdue_count, 1)
+        self.assertEqual([(loan.book_id, loan.title) for loan in summary.loans], [
+            (self.book.pk, 'First Book'), (self.second.pk, 'Second Book'),
+        ])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_loan_summary(self.reader), summary)
+
+    def test_invalidated_by_own_transitions_only(self):
+        get_loan_summary(self.reader)
+        get_loan_summary(self.other)
+
+        loans.borrow(self.available.pk, self.other)
+        self.assertIsNotNone(cache.get(loan_summary_key(self.reader.pk)))
+        self.assertEqual(get_loan_summary(self.other).count, 2)
+
+        loans.return_copy(self.overdue.pk)
+        self.assertEqual(get_loan_summary(self.reader).count, 1)
+        self.assertEqual(get_loan_summary(self.reader).overdue_count, 0)
+
+    def test_invalidated_by_copy_and_title_changes(self):
+        get_loan_summary(self.reader)
+        self.overdue.due_back = TODAY
+        self.overdue.save()
+        self.assertEqual(get_loan_summary(self.reader).overdue_count, 0)
+
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.assertEqual(get_loan_summary(self.reader).loans[0].title, 'Renamed')
+
+    def test_page_and_json_take_at_most_one_query(self):
+        self.client.force_login(self.reader)
+        # Besides the session, the user and the sidebar's two permission queries, one for the summary
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('my-borrowed'))
+        self.assertContains(response, 'First Book')
+        self.assertContains(response, '1 overdue')
+        with self.assertNumQueries(4):
+            self.client.get(reverse('my-borrowed'))
+
+        cache.delete(loan_summary_key(self.reader.pk))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('my-loan-summary'))
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(response.json()['loans'][1], {
+            'book_id': self.second.pk, 'title': 'Second Book', 'due_back': str(TODAY + datetime.timedelta(days=5)),
+        })
+
+    def test_json_requires_login(self):
+        self.assertEqual(self.client.get(reverse('my-loan-summary')).status_code, 401)
@@ -0,0 +1,245 @@
+import datetime
+import threading
+import uuid
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from catalog import loans
+from catalog.book_counters import drifted_books, rebuild_book_counters
+from catalog.models import Book, BookInstance
+
+User = get_user_model()
+
+class LoanTransitionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.other_user = User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+
+    def test_borrow_then_conflict(self):
+        self.assertTrue(loans.borrow(self.copy.pk, self.user).ok)
+        self.copy.refresh_from_db()
+        self.assertEqual((self.copy.status, self.copy.borrower), ('o', self.user))
+        self.assertEqual(self.copy.due_back, datetime.date.today() + loans.LOAN_PERIOD)
+
+        result = loans.borrow(self.copy.pk, self.other_user)
+        self.assertTrue(result.conflict)
+        self.copy.refresh_from_db()
+        self.assertEqual(self.copy.borrower, self.user)
+
+    def test_return_and_renew_need_a_loan(self):
+        self.assertTrue(loans.return_copy(self.copy.pk).conflict)
+        self.assertTrue(loans.renew(self.copy.pk, datetime.date.today()).conflict)
+
+        loans.borrow(self.copy.pk, self.user)
+        due_back = datetime.date.today() + datetime.timedelta(days=3)
+        self.assertTrue(loans.renew(self.copy.pk, due_back).ok)
+        self.copy.refresh_from_db()
+        self.assertEqual(self.copy.due_back, due_back)
+
+        self.assertTrue(loans.return_copy(self.copy.pk).ok)
+        self.copy.refresh_from_db()
+        self.assertEqual((self.copy.status, self.copy.borrower, self.copy.due_back), ('a', None, None))
+
+    def test_transition_only_writes_changed_columns(self):
+        BookInstance.objects.filter(pk=self.copy.pk).update(imprint='Changed elsewhere')
+        # The read, the compare-and-set UPDATE and the UPDATE of the book's counters
+        with self.assertNumQueries(3):
+            loans.borrow(self.copy.pk, self.user)
+        self.copy.refresh_from_db()
+        self.assertEqual(self.copy.imprint, 'Changed elsewhere')
+
+    def test_unknown_copy(self):
+        self.assertEqual(loans.borrow('00000000-0000-0000-0000-000000000000', self.user).outcome, loans.NOT_FOUND)
+
+    def test_signal_reports_borrowers(self):
+        received = []
+        def receiver(**kwargs):
+            received.append((kwargs['action'], kwargs['borrower_ids']))
+        loans.loan_transitioned.connect(receiver)
+        self.addCleanup(loans.loan_transitioned.disconnect, receiver)
+
+        loans.borrow(self.copy.pk, self.user)
+        loans.return_copy(self.copy.pk)
+        self.assertEqual(received, [('borrow', {self.user.pk}), ('return', {self.user.pk})])
+
+    def test_borrow_view_conflict(self):
+        loans.borrow(self.copy.pk, self.other_user)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.post(reverse('borrow-book', kwargs={'pk': self.copy.pk}))
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'cannot be borrowed', status_code=409)
+
+    def test_return_view(self):
+        loans.borrow(self.copy.pk, self.user)
+        response = self.client.post(reverse('return-book-librarian', kwargs={'pk': self.copy.pk}))
+        self.assertRedirects(response, reverse('borrowed'), fetch_redirect_response=False)
+        response = self.client.post(reverse('return-book-librarian', kwargs={'pk': self.copy.pk}))
+        self.assertEqual(response.status_code, 409)
+
+class LoanContentionTest(TransactionTestCase):
+    # Reads go to the reader connection under the production database profile
+    databases = '__all__'
+    THREADS = 16
+    COPIES = 5
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{i}') for i in range(self.THREADS)]
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        self.copies = [BookInstance.objects.create(book=book, imprint='Imprint', status='a') for _ in range(self.COPIES)]
+
+    def retry(self, func, *args):
+        # SQLite's shared in-memory test database reports a lock instead of waiting on it
+        while True:
+            try:
+                return func(*args)
+            except OperationalError:
+                continue
+
+    def test_no_double_loans(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        lock = threading.Lock()
+
+        def worker(user):
+            try:
+                barrier.wait()
+                for copy in self.copies:
+                    result = self.retry(loans.borrow, copy.pk, user)
+                    with lock:
+                        results.append((result, user.pk))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Exactly one thread wins each copy, every other attempt is a conflict, and the
+        # stored borrower is the winner rather than whoever wrote last.
+        for copy in self.copies:
+            attempts = [(result, user_pk) for result, user_pk in results if result.book_instance_id == copy.pk]
+            winners = [user_pk for result, user_pk in attempts if result.ok]
+            self.assertEqual(len(attempts), self.THREADS)
+            self.assertEqual(len(winners), 1)
+            self.assertTrue(all(result.conflict for result, _ in attempts if not result.ok))
+
+            copy.refresh_from_db()
+            self.assertEqual((copy.status, copy.borrower_id), ('o', winners[0]))
+
+class BulkLoanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+
+    def create_copies(self, number_of_copies, status, borrowers=None):
+        borrowers = borrowers or [self.user]
+        copies = BookInstance.objects.bulk_create([
+            BookInstance(book=self.book, imprint='Imprint', status=status,
+                         borrower=borrowers[number % len(borrowers)] if status == 'o' else None,
+                         due_back=datetime.date.today() if status == 'o' else None)
+            for number in range(number_of_copies)
+        ])
+        return [str(copy.pk) for copy in copies]
+
+    def test_bulk_return_reports_each_item(self):
+        on_loan = self.create_copies(3, 'o')
+        available = self.create_copies(1, 'a')
+        missing = str(uuid.uuid4())
+
+        results = loans.bulk_return(on_loan + available + [missing, 'not-a-uuid', on_loan[0]])
+        self.assertEqual([r.outcome for r in results], ['ok'] * 3 + ['conflict', 'not_found', 'not_found'])
+        self.assertEqual(BookInstance.objects.filter(status='a', borrower=None, due_back=None).count(), 4)
+
+    def test_bulk_return_query_count_is_per_chunk(self):
+        ids = self.create_copies(2000, 'o')
+        # One SELECT and one UPDATE per chunk of ids, plus the savepoint and one UPDATE of the book's counters
+        chunks = -(-len(ids) // loans.BULK_CHUNK_SIZE)
+        with self.assertNumQueries(2 * chunks + 3):
+            results = loans.bulk_return(ids)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_bulk_return_query_count_is_per_chunk_across_borrowers(self):
+        borrowers = User.objects.bulk_create([User(username=f'borrower{number}') for number in range(50)])
+        ids = self.create_copies(2000, 'o', borrowers)
+        chunks = -(-len(ids) // loans.BULK_CHUNK_SIZE)
+        with self.assertNumQueries(2 * chunks + 3):
+            results = loans.bulk_return(ids)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertFalse(BookInstance.objects.exclude(borrower=None).exists())
+
+    def test_bulk_renew_and_maintenance(self):
+        ids = self.create_copies(2, 'o') + self.create_copies(1, 'm')
+        due_back = datetime.date.today() + datetime.timedelta(weeks=1)
+        self.assertEqual([r.outcome for r in loans.bulk_renew(ids, due_back)], ['ok', 'ok', 'conflict'])
+        self.assertEqual(BookInstance.objects.filter(due_back=due_back).count(), 2)
+
+        self.assertEqual([r.outcome for r in loans.bulk_mark_maintenance(ids)], ['ok', 'ok', 'conflict'])
+        self.assertEqual(BookInstance.objects.filter(status='m', borrower=None).count(), 3)
+
+    def test_bulk_retries_copies_changed_after_reading(self):
+        copy_id = self.create_copies(1, 'a')[0]
+        rebuild_book_counters([self.book.pk])
+        # The batch reads the copy as available, then another request lends it before the update
+        stale = loans.read_copies([copy_id])
+        self.assertTrue(loans.borrow(copy_id, self.user).ok)
+
+        reported = []
+        def receiver(sender, **kwargs):
+            reported.append(kwargs)
+        loans.loan_transitioned.connect(receiver)
+        self.addCleanup(loans.loan_transitioned.disconnect, receiver)
+
+        with mock.patch('catalog.loans.read_copies', side_effect=[stale, loans.read_copies([copy_id])]):
+            results = loans.bulk_mark_maintenance([copy_id])
+        self.assertTrue(results[0].ok)
+        # The retry read the loan, so its borrower is reported and the counters moved from 'o'
+        self.assertEqual(reported[-1]['borrower_ids'], {self.user.pk})
+        self.assertFalse(drifted_books().exists())
+
+    def test_bulk_retries_copies_returned_and_lent_again(self):
+        copy_id = self.create_copies(1, 'o')[0]
+        # Read on loan to one borrower, then returned and lent to another before the update
+        stale = loans.read_copies([copy_id])
+        self.assertTrue(loans.return_copy(copy_id).ok)
+        self.assertTrue(loans.borrow(copy_id, self.librarian).ok)
+
+        reported = []
+        def receiver(sender, **kwargs):
+            reported.append(kwargs)
+        loans.loan_transitioned.connect(receiver)
+        self.addCleanup(loans.loan_transitioned.disconnect, receiver)
+
+        with mock.patch('catalog.loans.read_copies', side_effect=[stale, loans.read_copies([copy_id])]):
+            self.assertTrue(loans.bulk_return([copy_id])[0].ok)
+        self.assertEqual(reported[-1]['borrower_ids'], {self.librarian.pk})
+
+    def test_bulk_view_requires_permission(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.post(reverse('bulk-loans', kwargs={'action': 'return'}), {'ids': []})
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_view_json(self):
+        ids = self.create_copies(2, 'o')
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.post(
+            reverse('bulk-loans', kwargs={'action': 'renew'}),
+            {'ids': ids, 'due_back': str(datetime.date.today() + datetime.timedelta(weeks=5))},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('bulk-loans', kwargs={'action': 'return'}), {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts'], {'ok': 2})
+        self.assertEqual([item['id'] for item in response.json()['results']], ids)
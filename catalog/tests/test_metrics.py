@@ -0,0 +1,113 @@
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from catalog.metrics import (
+    MetricsRegistry, RequestSample, install_query_recorder, instrument_connections, instrument_templates,
+    prometheus_text, record_query, registry,
+)
+from django.contrib.auth import get_user_model
+from catalog.models import Author, Book, BookInstance
+
+User = get_user_model()
+
+class MetricsRegistryTest(TestCase):
+    def test_rolling_window_and_totals(self):
+        metrics = MetricsRegistry(window_size=10)
+        for i in range(1, 21):
+            metrics.record('index', RequestSample(queries=i, db_seconds=0, template_seconds=0, wall_seconds=i / 100))
+        snapshot = metrics.snapshot()['index']
+
+        # Totals cover every request, quantiles only the last 10 (11..20)
+        self.assertEqual(snapshot['count'], 20)
+        self.assertEqual(snapshot['sum']['queries'], 210)
+        self.assertEqual(snapshot['quantiles']['queries'][0.5], 16)
+        self.assertEqual(snapshot['quantiles']['queries'][0.95], 20)
+
+METRICS_MIDDLEWARE = 'catalog.metrics.QueryMetricsMiddleware'
+
+@override_settings(CATALOG_METRICS=True, MIDDLEWARE=[METRICS_MIDDLEWARE, *(name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE)])
+class QueryMetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # What CatalogConfig.ready() does with metrics enabled, plus the test connection that is already open
+        instrument_connections()
+        instrument_templates()
+        install_query_recorder(None, connection)
+
+    @classmethod
+    def tearDownClass(cls):
+        connection.execute_wrappers.remove(record_query)
+        connection_created.disconnect(dispatch_uid='catalog.metrics.record_query')
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Title', summary='Summary', isbn='ABC', author=author)
+
+    def setUp(self):
+        registry.reset()
+
+    def test_records_per_url_name(self):
+        self.client.get(self.book.get_absolute_url())
+        self.client.get(self.book.get_absolute_url())
+        snapshot = registry.snapshot()['book-detail']
+        self.assertEqual(snapshot['count'], 2)
+        self.assertEqual(snapshot['quantiles']['queries'][0.5], 3)
+        self.assertGreater(snapshot['sum']['template_seconds'], 0)
+        self.assertGreaterEqual(snapshot['sum']['wall_seconds'], snapshot['sum']['template_seconds'])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('generic-list', kwargs={'model_name': 'Book'}))
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4')
+        body = response.content.decode()
+        self.assertIn('# TYPE catalog_request_seconds summary', body)
+        self.assertIn('catalog_request_queries_count{view="generic-list"} 1', body)
+        self.assertIn('catalog_request_queries{view="generic-list",quantile="0.95"} 2', body)
+
+    @override_settings(CATALOG_METRICS_TOKEN='scraper-token')
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper-token').status_code, 200)
+
+        with override_settings(CATALOG_METRICS=False):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper-token').status_code, 404)
+
+    @override_settings(CATALOG_QUERY_BUDGET=1)
+    def test_over_budget_logs_repeated_sql(self):
+        with self.assertLogs('catalog.metrics', level='WARNING') as logs:
+            self.client.get(self.book.get_absolute_url())
+        self.assertIn('ran 3 queries, over the budget of 1', logs.output[0])
+
+    @override_settings(CATALOG_QUERY_BUDGET=5)
+    def test_over_budget_reports_n_plus_one(self):
+        user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        for _ in range(5):
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=user)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+        # Without select_related the borrowed list template loads each copy's book (and borrower) separately
+        unjoined = lambda: BookInstance.objects.filter(status='o').order_by('due_back')
+        with mock.patch('catalog.views.borrowed_copies', unjoined), self.assertLogs('catalog.metrics', level='WARNING') as logs:
+            self.client.get(reverse('borrowed'))
+        self.assertRegex(logs.output[0], r'Repeated SQL:\n(.*\n)?5x SELECT .* FROM "catalog_book"')
+
+        # Joined, the page costs the same however many copies are listed
+        with override_settings(CATALOG_QUERY_BUDGET=6), self.assertNoLogs('catalog.metrics', level='WARNING'):
+            self.client.get(reverse('borrowed'))
+
+    def test_prometheus_text_escapes_labels(self):
+        text = prometheus_text({'a"b': {
+            'count': 1,
+            'sum': dict.fromkeys(RequestSample.__slots__, 1),
+            'quantiles': {field: {0.5: 1} for field in RequestSample.__slots__},
+        }})
+        self.assertIn('catalog_request_seconds_count{view="a\\"b"} 1', text)
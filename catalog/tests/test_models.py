@@ -1,5 +1,8 @@
+import unittest
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
-from catalog.models import Author
+from catalog.models import Author, Book, BookInstance
 
 class AuthorModelTest(TestCase):
     @classmethod
@@ -30,4 +33,36 @@ class AuthorModelTest(TestCase):
     def test_get_absolute_url(self):
         author = Author.objects.get(id=1)
         # This will also fail if the urlconf is not defined.
-        self.assertEqual(author.get_absolute_url(), '/catalog/author/1')
\ No newline at end of file
+        self.assertEqual(author.get_absolute_url(), '/catalog/author/1')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite specific')
+class BookInstanceIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        for status in 'maor':
+            BookInstance.objects.create(book=book, imprint='Imprint', status=status, borrower=cls.user)
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'INDEX {index_name}', plan)
+        # A full table scan shows up as SCAN without USING INDEX
+        self.assertNotRegex(plan, r'SCAN catalog_bookinstance(?! USING)')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_loaned_books_query_uses_index(self):
+        queryset = BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        self.assertUsesIndex(queryset, 'bookinstance_status_due_idx')
+
+    def test_loaned_books_by_user_query_uses_index(self):
+        queryset = BookInstance.objects.filter(borrower=self.user).filter(status__exact='o').order_by('due_back')
+        self.assertUsesIndex(queryset, 'bookinstance_borrower_loan_idx')
+
+    def test_available_count_uses_index(self):
+        plan = BookInstance.objects.filter(status__exact='a').values('pk').explain()
+        self.assertIn('INDEX bookinstance_status_due_idx', plan)
+
+    def test_default_ordering_uses_index(self):
+        self.assertUsesIndex(BookInstance.objects.all(), 'bookinstance_due_back_idx')
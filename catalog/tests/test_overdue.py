@@ -0,0 +1,75 @@
+import datetime
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from catalog.models import Author, Book, BookInstance, Language, OverdueReport
+from catalog.reports import build_overdue_report
+
+TODAY = datetime.date(2026, 3, 1)
+
+class OverdueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(name='English')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author, language=language)
+        cls.other_book = Book.objects.create(title='Other Title', summary='Summary', isbn='HIJKLMN', author=author, language=language)
+        User = get_user_model()
+        cls.alice = User.objects.create_user(username='alice', password='1X<ISRUkw+tuK')
+        cls.bob = User.objects.create_user(username='bob', password='1X<ISRUkw+tuK')
+
+        def loan(book, borrower, days_overdue, status='o'):
+            return BookInstance.objects.create(
+                book=book, imprint='Imprint', status=status, borrower=borrower,
+                due_back=TODAY - datetime.timedelta(days=days_overdue),
+            )
+
+        cls.late = [loan(cls.book, cls.alice, 10), loan(cls.book, cls.alice, 3), loan(cls.other_book, cls.bob, 5)]
+        # Due today, due later, and a past due date on a copy that is no longer on loan
+        loan(cls.book, cls.bob, 0)
+        loan(cls.other_book, cls.alice, -7)
+        loan(cls.other_book, None, 30, status='m')
+
+    def test_overdue_queryset(self):
+        self.assertEqual(
+            set(BookInstance.objects.overdue(TODAY).values_list('pk', flat=True)),
+            {copy.pk for copy in self.late},
+        )
+
+    def test_overdue_flag_replaces_per_row_dates(self):
+        copies = list(BookInstance.objects.filter(status='o').with_overdue_flag(TODAY))
+        with mock.patch('catalog.models.date') as patched_date:
+            flags = {copy.pk: copy.is_overdue for copy in copies}
+        patched_date.today.assert_not_called()
+        self.assertEqual({pk for pk, flag in flags.items() if flag}, {copy.pk for copy in self.late})
+
+    def test_days_overdue(self):
+        days = {copy.pk: copy.days_overdue.days for copy in BookInstance.objects.overdue(TODAY).with_days_overdue(TODAY)}
+        self.assertEqual(sorted(days.values()), [3, 5, 10])
+
+    def test_overdue_summary(self):
+        with self.assertNumQueries(1):
+            summary = BookInstance.objects.overdue_summary(TODAY)
+        self.assertEqual(summary, {'overdue_count': 3, 'overdue_days_total': 18, 'overdue_days_max': 10})
+
+    def test_report_groups(self):
+        with self.assertNumQueries(2):
+            report = build_overdue_report(TODAY)
+        self.assertEqual(report['overdue_count'], 3)
+        self.assertEqual(report['overdue_days_total'], 18)
+        self.assertEqual(report['by_borrower'], [
+            {'borrower_id': self.alice.pk, 'username': 'alice', 'count': 2, 'days': 13, 'max_days': 10},
+            {'borrower_id': self.bob.pk, 'username': 'bob', 'count': 1, 'days': 5, 'max_days': 5},
+        ])
+        self.assertEqual([group['title'] for group in report['by_book']], ['Book Title', 'Other Title'])
+
+    def test_report_command_replaces_same_day(self):
+        out = StringIO()
+        call_command('overdue_report', date=TODAY.isoformat(), stdout=out)
+        call_command('overdue_report', date=TODAY.isoformat(), stdout=out)
+        self.assertEqual(OverdueReport.objects.count(), 1)
+        report = OverdueReport.objects.get()
+        self.assertEqual((report.date, report.overdue_count, report.overdue_days_max), (TODAY, 3, 10))
+        self.assertIn('3 overdue copies', out.getvalue())
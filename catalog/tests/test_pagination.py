@@ -0,0 +1,126 @@
+import datetime
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+from catalog import loans
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.pagination import KEYSET_ORDERINGS, KeysetPaginator, ListKeysetPaginator
+
+User = get_user_model()
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Duplicate last names so the tie-breaking columns matter
+        for author_id in range(23):
+            Author.objects.create(first_name=f'First {author_id % 4}', last_name=f'Last {author_id % 5}')
+
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        today = datetime.date.today()
+        for copy in range(17):
+            # A mix of NULL and repeated due dates
+            due_back = None if copy % 4 == 0 else today + datetime.timedelta(days=copy % 3)
+            BookInstance.objects.create(book=book, imprint='Imprint', due_back=due_back, status='a')
+
+    def walk(self, queryset, ordering):
+        '''Follows next cursors to the end, then prev cursors back to the start.'''
+        paginator = KeysetPaginator(queryset, 5, ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(backwards[-1].previous_cursor))
+        return pages, backwards
+
+    def test_authors_follow_natural_ordering(self):
+        pages, backwards = self.walk(Author.objects.all(), ('last_name', 'first_name', 'id'))
+        expected = list(Author.objects.order_by('last_name', 'first_name', 'id'))
+        self.assertEqual([a for page in pages for a in page], expected)
+        self.assertEqual([a for page in reversed(backwards) for a in page], expected)
+        self.assertFalse(pages[0].has_previous())
+
+    def test_nullable_due_back(self):
+        ordering = ('due_back', 'id')
+        pages, backwards = self.walk(BookInstance.objects.all(), ordering)
+        paginator = KeysetPaginator(BookInstance.objects.all(), 5, ordering)
+        expected = list(BookInstance.objects.order_by(*paginator.order_by()))
+        self.assertEqual([c for page in pages for c in page], expected)
+        self.assertEqual([c for page in reversed(backwards) for c in page], expected)
+
+    def test_page_is_one_query(self):
+        paginator = KeysetPaginator(Author.objects.all(), 5, ('last_name', 'first_name', 'id'))
+        cursor = paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            paginator.page(cursor)
+
+class KeysetListViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for genre_id in range(13):
+            Genre.objects.create(name=f'Genre {genre_id}')
+
+    def test_cursor_mode_skips_count(self):
+        # One query for the page and none for COUNT(*)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('generic-list', kwargs={'model_name': 'Genre'}) + '?cursor=')
+        self.assertTrue(response.context['keyset_paginated'])
+        self.assertEqual(len(response.context['object_list']), 10)
+
+        response = self.client.get(
+            reverse('generic-list', kwargs={'model_name': 'Genre'}),
+            {'cursor': response.context['page_obj'].next_cursor},
+        )
+        self.assertEqual(len(response.context['object_list']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_offset_mode_is_default(self):
+        response = self.client.get(reverse('generic-list', kwargs={'model_name': 'Genre'}))
+        self.assertFalse(response.context['keyset_paginated'])
+        self.assertEqual(response.context['paginator'].num_pages, 2)
+
+    def test_tampered_cursor_is_404(self):
+        response = self.client.get(reverse('generic-list', kwargs={'model_name': 'Genre'}) + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_loaned_books_cursor_mode(self):
+        user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        for copy in range(12):
+            BookInstance.objects.create(
+                book=book, imprint='Imprint', borrower=user, status='o',
+                due_back=datetime.date.today() + datetime.timedelta(days=copy),
+            )
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('my-borrowed') + '?cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['keyset_paginated'])
+        self.assertEqual(len(response.context['bookinstance_list']), 10)
+        self.assertTrue(response.context['page_obj'].has_next())
+        first_page = response.context['bookinstance_list']
+
+        # Seeks from the last loan of the page, returning a copy on the first page does not shift the second
+        self.assertTrue(loans.return_copy(first_page[0].book_instance_id).ok)
+        response = self.client.get(reverse('my-borrowed'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(response.context['bookinstance_list']), 2)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        # The returned copy is gone from the refreshed summary
+        response = self.client.get(reverse('my-borrowed'), {'cursor': response.context['page_obj'].previous_cursor})
+        self.assertEqual(response.context['bookinstance_list'], first_page[1:10])
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertEqual(self.client.get(reverse('my-borrowed'), {'cursor': 'garbage'}).status_code, 404)
+
+    def test_list_cursors_only_fit_their_list(self):
+        genre_cursor = KeysetPaginator(Genre.objects.all(), 2, KEYSET_ORDERINGS['Genre']).page().next_cursor
+        # Keys shaped like loan_keyset's, a bool first
+        paginator = ListKeysetPaginator(range(30), 10, lambda number: (number >= 0, number))
+        self.assertEqual(list(paginator.page(paginator.page().next_cursor)), list(range(10, 20)))
+
+        # Signed for another list, or holding values that do not compare with this list's keys
+        other = ListKeysetPaginator(['a', 'b'], 1, lambda letter: (letter, None))
+        for cursor in [genre_cursor, other.page().next_cursor]:
+            with self.subTest(cursor=cursor), self.assertRaises(Http404):
+                paginator.page(cursor)
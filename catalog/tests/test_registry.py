@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from catalog.models import Book, Genre
+from catalog.registry import get_entry, registry
+
+class ModelRegistryTest(TestCase):
+    def test_entries_are_built_once(self):
+        entry = get_entry('Book')
+        self.assertIs(entry, get_entry('book'))
+        self.assertIs(entry.model, Book)
+        self.assertEqual(entry.permissions['add'], 'catalog.add_book')
+        self.assertEqual(list(entry.forms['add'].base_fields), ['title', 'author', 'summary', 'isbn', 'genre', 'language'])
+        self.assertEqual(set(registry), {'author', 'book', 'bookinstance', 'genre', 'language'})
+
+    def test_unknown_model_is_not_found(self):
+        self.assertEqual(self.client.get('/catalog/Unknown/').status_code, 404)
+        self.assertEqual(self.client.get('/catalog/Unknown/create/').status_code, 404)
+
+    def test_create_uses_registry_form(self):
+        user = get_user_model().objects.create_user(username='librarian', password='1X<ISRUkw+tuK')
+        user.user_permissions.add(Permission.objects.get(codename='add_genre'))
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+
+        url = reverse('create', kwargs={'model_name': 'Genre'})
+        response = self.client.get(url)
+        self.assertIs(type(response.context['form']), get_entry('Genre').forms['add'])
+        self.assertTemplateUsed(response, 'form_generic.html')
+
+        response = self.client.post(url, {'name': 'Fantasy'})
+        self.assertRedirects(response, reverse('generic-list', kwargs={'model_name': 'Genre'}))
+        self.assertTrue(Genre.objects.filter(name='Fantasy').exists())
+
+    def test_create_requires_permission(self):
+        get_user_model().objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('create', kwargs={'model_name': 'Genre'}))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,75 @@
+import unittest
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from catalog.models import Author, Book, Genre
+from catalog.search import MIN_PREFIX_LENGTH, build_match_query, rebuild_search_index, search_books
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'The FTS5 index is SQLite only')
+class BookSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = Author.objects.create(first_name='John', last_name='Tolkien')
+        cls.fantasy = Genre.objects.create(name='Fantasy')
+        cls.hobbit = Book.objects.create(title='The Hobbit', summary='A journey there and back again', isbn='9780261102217', author=cls.tolkien)
+        cls.hobbit.genre.add(cls.fantasy)
+        cls.other = Book.objects.create(title='Cooking Basics', summary='Mentions hobbit food once', isbn='9780000000001')
+
+    def ids(self, text, **kwargs):
+        return [book.pk for book in search_books(text, **kwargs)]
+
+    def test_build_match_query_quotes_terms(self):
+        self.assertEqual(build_match_query('hob "tol OR'), '"hob"* "tol"* "OR"')
+        self.assertEqual(build_match_query('  '), '')
+
+    def test_prefix_index_matches_min_prefix_length(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'catalog_book_search'")
+            self.assertIn(f"prefix = '{MIN_PREFIX_LENGTH}'", cursor.fetchone()[0])
+        # Shorter terms match whole words only
+        self.assertEqual(self.ids('ho'), [])
+
+    def test_title_ranks_above_summary(self):
+        self.assertEqual(self.ids('hobbit'), [self.hobbit.pk, self.other.pk])
+
+    def test_prefix_author_genre_and_isbn(self):
+        self.assertEqual(self.ids('tolk'), [self.hobbit.pk])
+        self.assertEqual(self.ids('fanta'), [self.hobbit.pk])
+        self.assertEqual(self.ids('9780261'), [self.hobbit.pk])
+
+    def test_index_follows_changes(self):
+        self.tolkien.last_name = 'Renamed'
+        self.tolkien.save()
+        self.assertEqual(self.ids('tolkien'), [])
+        self.assertEqual(self.ids('renamed'), [self.hobbit.pk])
+
+        self.hobbit.genre.clear()
+        self.assertEqual(self.ids('fantasy'), [])
+        self.fantasy.book_set.add(self.other)
+        self.assertEqual(self.ids('fantasy'), [self.other.pk])
+
+        self.other.delete()
+        self.assertEqual(self.ids('cooking'), [])
+
+    def test_keyset_pages(self):
+        for i in range(25):
+            Book.objects.create(title=f'Dragon {i}', summary='Summary', isbn=f'ISBN{i}')
+        rebuild_search_index()
+
+        seen = []
+        page = search_books('dragon', per_page=10)
+        seen += page.object_list
+        while page.has_next():
+            page = search_books('dragon', per_page=10, cursor=page.next_cursor)
+            seen += page.object_list
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        back = search_books('dragon', per_page=10, cursor=page.previous_cursor)
+        self.assertEqual(back.object_list, seen[10:20])
+
+    def test_search_view(self):
+        response = self.client.get(reverse('search'), {'q': 'hobb'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/search.html')
+        self.assertEqual(response.context['results'], [self.hobbit, self.other])
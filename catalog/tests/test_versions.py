@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test import TestCase
+from catalog import loans
+from catalog.book_counters import rebuild_book_counters
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.versions import max_version
+
+class RowVersionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.language = Language.objects.create(name='English')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='Book', summary='Summary', isbn='ABCDEFG', author=cls.author, language=cls.language)
+        cls.other = Book.objects.create(title='Other', summary='Summary', isbn='HIJKLMN', author=cls.author)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+
+    def version(self, obj):
+        return type(obj).objects.values_list('version', flat=True).get(pk=obj.pk)
+
+    def test_save_takes_the_next_version(self):
+        # Inserts read their version back
+        self.assertEqual(self.book.version, 1)
+        self.assertEqual(self.other.version, 2)
+        # Adding the copy moved the book's counters
+        self.assertEqual(max_version(Book), 3)
+
+        book = Book.objects.get(pk=self.other.pk)
+        book.title = 'Renamed'
+        book.save()
+        self.assertEqual(self.version(book), 4)
+        self.assertEqual(max_version(Book), 4)
+        self.assertEqual(max_version(Author), 1)
+
+        for model in (Author, Genre, Language):
+            obj = model.objects.first()
+            obj.save()
+            self.assertEqual(self.version(obj), 2)
+
+    def test_saved_instances_hold_their_version(self):
+        self.genre.name = 'Horror'
+        self.genre.save()
+        self.assertIsInstance(self.genre.version, int)
+        self.assertEqual(self.genre.version, self.version(self.genre))
+        self.genre.full_clean()
+
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.save(update_fields=['imprint'])
+        self.assertEqual(copy.version, self.version(copy))
+
+    def test_updates_take_the_next_version(self):
+        start = max_version(Book)
+        loans.borrow(self.copy.pk, None)
+        self.assertEqual(self.version(self.copy), 2)
+        # The book's counters moved
+        self.assertGreater(self.version(self.book), start)
+
+        loans.bulk_return([self.copy.pk])
+        self.assertEqual(self.version(self.copy), 3)
+
+        Book.objects.filter(pk=self.other.pk).update(copies_total=5)
+        start = max_version(Book)
+        rebuild_book_counters([self.other.pk])
+        self.assertEqual(self.version(self.other), start + 1)
+
+    def test_genre_changes_bump_the_book(self):
+        start = max_version(Book)
+        self.book.genre.add(self.genre)
+        self.assertEqual(self.version(self.book), start + 1)
+        self.genre.book_set.add(self.other)
+        self.assertEqual(self.version(self.other), start + 2)
+        self.genre.book_set.clear()
+        self.assertEqual(self.version(self.book), start + 3)
+        self.assertEqual(self.version(self.other), start + 3)
+        self.assertEqual(self.version(self.author), 1)
+
+    def test_max_version_reads_the_index(self):
+        with self.assertNumQueries(1):
+            max_version(BookInstance)
+        plan = Book.objects.order_by('-version').values_list('version', flat=True)[:1].explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING COVERING INDEX', plan)
+        self.assertEqual(max_version(Genre), 1)
@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.urls import reverse
+from django.core.cache import cache
 from catalog.models import Author
 import datetime
 from django.utils import timezone
@@ -136,10 +137,11 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
 
         self.assertTrue('bookinstance_list' in response.context)
 
-        # Confirm all books belong to testuser1 and are on loan
+        # Confirm all books belong to testuser1 and are on loan, the list is their loan summary
+        on_loan = BookInstance.objects.filter(borrower=response.context['user'], status='o')
+        self.assertEqual(len(response.context['bookinstance_list']), on_loan.count())
         for bookitem in response.context['bookinstance_list']:
-            self.assertEqual(response.context['user'], bookitem.borrower)
-            self.assertEqual(bookitem.status, 'o')
+            self.assertTrue(on_loan.filter(book_id=bookitem.book_id, due_back=bookitem.due_back).exists())
 
     def test_pages_ordered_by_due_date(self):
         # Change all books to be on loan
@@ -363,4 +365,62 @@ class AuthorCreateViewTest(TestCase):
         self.test_user.user_permissions.remove(self.permission)
         self.client.login(username='test_user', password='some_password')
         response = self.client.get(reverse('author-create'))
-        self.assertEqual(response.status_code, 403)
\ No newline at end of file
+        self.assertEqual(response.status_code, 403)
+
+
+class GenericListViewQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        language = Language.objects.create(name='English')
+        for i in range(15):
+            author = Author.objects.create(first_name=f'First {i}', last_name=f'Last {i}')
+            Genre.objects.create(name=f'Genre {i}')
+            Language.objects.create(name=f'Language {i}')
+            book = Book.objects.create(title=f'Title {i}', summary='Summary', isbn=f'ISBN{i}', author=author, language=language)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+
+    def test_list_pages_are_capped_at_two_queries(self):
+        # COUNT(*) for the paginator plus the page itself, whatever the model
+        for model_name in ['Author', 'Book', 'BookInstance', 'Genre', 'Language']:
+            with self.subTest(model_name=model_name), self.assertNumQueries(2):
+                response = self.client.get(reverse('generic-list', kwargs={'model_name': model_name}))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['object_list']), 10)
+
+class BookDetailViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(name='English')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author, language=language)
+        cls.book.genre.set([Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Horror')])
+
+    def setUp(self):
+        # Rolled back rows keep their bumped page versions, don't serve pages from another test
+        cache.clear()
+
+    def create_copies(self, number_of_copies):
+        for copy in range(number_of_copies):
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='ao'[copy % 2])
+
+    def test_query_count_does_not_grow_with_copies(self):
+        # Book with author and language, genres, copies
+        for number_of_copies in [1, 50]:
+            self.create_copies(number_of_copies)
+            with self.subTest(copies=number_of_copies), self.assertNumQueries(3):
+                response = self.client.get(self.book.get_absolute_url())
+                self.assertEqual(response.status_code, 200)
+
+    def test_availability_summary(self):
+        self.create_copies(5)
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertEqual(response.context['availability'], [
+            {'status': 'o', 'label': 'On loan', 'count': 2},
+            {'status': 'a', 'label': 'Available', 'count': 3},
+        ])
+        self.assertEqual(len(response.context['copies']), 5)
+
+    def test_no_copies(self):
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertEqual(response.context['availability'], [])
+        self.assertContains(response, 'No copies of this book found.')
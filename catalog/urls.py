@@ -5,6 +5,19 @@ urlpatterns = [
     # Home
     path('', views.index, name='index'),
 
+    # Search - Before the generic views so 'search' is not taken as a model name
+    path('search/', views.book_search, name='search'),
+
+    # Request metrics (Prometheus)
+    path('_metrics', views.metrics, name='metrics'),
+
+    # Export - ?format=csv|ndjson&since=ISO date
+    path('export/<str:model_name>/', views.catalog_export, name='export'),
+
+    # JSON read API - Before the generic views so 'api' is not taken as a model name
+    path('api/<str:model_name>/', views.api_list, name='api-list'),
+    path('api/<str:model_name>/<str:pk>/', views.api_detail, name='api-detail'),
+
     # Generic list view
     path('<str:model_name>/', views.GenericListView.as_view(), name='generic-list'),
 
@@ -41,4 +54,6 @@ urlpatterns = [
     path('book/<uuid:pk>/borrow/', views.book_borrow, name='borrow-book'),
     path('book/<uuid:pk>/return/', views.book_return_librarian, name='return-book-librarian'),
     path('books/mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
+    path('books/mybooks/summary/', views.my_loan_summary, name='my-loan-summary'),
+    path('books/bulk/<str:action>/', views.bulk_loans, name='bulk-loans'),
 ]
\ No newline at end of file
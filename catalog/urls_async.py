@@ -0,0 +1,23 @@
+from django.urls.resolvers import URLPattern
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# The catalog URLs with the read-only views replaced by their native async versions.
+# Included by locallibrary.urls_async, the ROOT_URLCONF of the ASGI application.
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'generic-list': async_views.GenericListView.as_view(),
+    'book-detail': async_views.BookDetailView.as_view(),
+    'author-detail': async_views.AuthorDetailView.as_view(),
+    'genre-detail': async_views.GenreDetailView.as_view(),
+    'language-detail': async_views.LanguageDetailView.as_view(),
+    'bookinstance-detail': async_views.BookInstanceDetailView.as_view(),
+    'borrowed': async_views.LoanedBooksListView.as_view(),
+    'my-borrowed': async_views.LoanedBooksByUserListView.as_view(),
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
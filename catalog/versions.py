@@ -0,0 +1,26 @@
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+# Row versions. Every catalog model has an indexed version column, set on each save and
+# bulk update to one more than the highest version in its table, in the same statement.
+# Versions therefore only grow, and a table's highest version moves with every change
+# to it except deletes, which the page cache scopes (catalog.caching) already track.
+# Every row one statement writes gets the same version, e.g. all the rows of an update(),
+# a bulk_create() or a chunk of import_catalog. On SQLite writers are serialized, so no two
+# statements share a version. Concurrent PostgreSQL transactions can, which still moves
+# the highest version.
+
+
+def next_version(model):
+    '''
+    Expression for version in save() or QuerySet.update(): the table's highest version plus one,
+    read through the version index. Saved instances have the value read back by a post_save handler.
+    '''
+    highest = model._default_manager.order_by('-version').values('version')[:1]
+    return Coalesce(Subquery(highest), 0) + 1
+
+
+def max_version(model, using=None):
+    '''The highest version in the model's table, one index lookup. A cheap cache key for whole lists.'''
+    queryset = model._default_manager.using(using) if using else model._default_manager
+    return queryset.order_by('-version').values_list('version', flat=True).first() or 0
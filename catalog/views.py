@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404
+from django.db.models import Prefetch
 from .models import Book, Author, BookInstance, Genre, Language
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -9,92 +10,145 @@ from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.urls import reverse
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.apps import apps
+from .counters import get_index_counters
+from .loan_summary import get_loan_summary, loan_keyset
+from .visits import count_visit, get_visits
+from .caching import VersionedCacheMixin
+from .registry import RegisteredModelMixin, get_entry
+from .pagination import KeysetPaginationMixin, ListKeysetPaginator, KEYSET_ORDERINGS
+from .querysets import borrowed_copies
+from .search import search_books
+from . import loans
+from . import api
+from . import export
+from .metrics import prometheus_text, registry
+from django.conf import settings
+from django.http import HttpResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.functional import SimpleLazyObject
+from django.contrib.auth.decorators import permission_required
+from django.views.decorators.http import require_POST, require_safe
+from collections import Counter
+import hmac
+import json
 
 # Home
 def index(request):
     '''View function for home page of site.'''
 
-    # Generate counts of some of the main objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    num_genres = Genre.objects.all().count()
+    # Counts of the main objects, computed in one query and cached until a catalog model changes
+    counters = get_index_counters()
 
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
+    # Number of visits to this view, as counted in a signed cookie rather than the session,
+    # so rendering the home page never writes to the database.
+    num_visits = get_visits(request)
 
-    # Available books (title = 'a')
-    num_books_with_the = Book.objects.filter(title__icontains='the').count()
+    context = {
+        **counters,
+        'num_visits': num_visits,
+    }
+
+    # Render the HTML template index.html with the data in the context variable
+    return count_visit(render(request, 'index.html', context=context), num_visits)
 
-    # The 'all()' is implied by default.
-    num_authors = Author.objects.count()
+# Search
+def book_search(request):
+    '''Ranked full-text search over book titles, summaries, authors, genres and ISBNs.'''
+    query = request.GET.get('q', '').strip()
 
-    # Number of visits to this view, as counted in the session variable.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
+    # Keyset paginated, the cursor encodes the rank and id of the last result seen
+    page = search_books(query, per_page=10, cursor=request.GET.get('cursor') or None)
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_genres': num_genres,
-        'num_books_with_the': num_books_with_the,
-        'num_visits': num_visits,
+        'query': query,
+        'page_obj': page,
+        'results': page.object_list,
     }
 
-    # Render the HTML template index.html with the data in the context variable
-    return render(request, 'index.html', context=context)
+    return render(request, 'catalog/search.html', context=context)
 
 # List view
-class GenericListView(generic.ListView):
-    template_name = 'list_generic.html'
+class GenericListView(RegisteredModelMixin, VersionedCacheMixin, KeysetPaginationMixin, generic.ListView):
+    registry_action = 'view'
     context_object_name = 'object_list'
     paginate_by = 10
 
+    def get_cache_scopes(self):
+        return [self.entry.cache_scope]
+
     def get_queryset(self):
-        model_name = self.kwargs['model_name']
-        model = apps.get_model('catalog', model_name)
-        return model.objects.all()
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['model_name'] = self.kwargs['model_name']
-        return context
+        return self.entry.list_queryset()
+
+    def get_keyset_ordering(self):
+        return self.entry.keyset_ordering
     
 # Detail views
 # Book details
-class BookDetailView(generic.DetailView):
+class BookDetailView(VersionedCacheMixin, generic.DetailView):
     model = Book
 
+    def get_cache_scopes(self):
+        return [f"book:{self.kwargs['pk']}"]
+
+    def get_queryset(self):
+        # Book, author and language in one query, genres and copies only if the fragment is rendered
+        return Book.objects.select_related('author', 'language')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        copies = SimpleLazyObject(lambda: list(self.object.bookinstance_set.all()))
+        context['copies'] = copies
+        context['availability'] = SimpleLazyObject(lambda: availability(copies))
+        return context
+
+def availability(copies):
+    '''Counts copies per status, in LOAN_STATUS order, leaving out statuses with no copies.'''
+    counts = Counter(copy.status for copy in copies)
+    return [
+        {'status': status, 'label': label, 'count': counts[status]}
+        for status, label in BookInstance.LOAN_STATUS
+        if counts[status]
+    ]
+
 # Author details
-class AuthorDetailView(generic.DetailView):
+class AuthorDetailView(VersionedCacheMixin, generic.DetailView):
     model = Author
 
+    def get_cache_scopes(self):
+        return [f"author:{self.kwargs['pk']}"]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         author = self.object
-        context['books'] = author.book_set.all() 
+        context['books'] = author.book_set.prefetch_related('genre')
         return context
     
 # Genre details
-class GenreDetailView(generic.DetailView):
+class GenreDetailView(VersionedCacheMixin, generic.DetailView):
     model = Genre
 
+    def get_cache_scopes(self):
+        return [f"genre:{self.kwargs['pk']}"]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         genre = self.object
-        context['books'] = genre.book_set.all() 
+        context['books'] = genre.book_set.prefetch_related('genre')
         return context
     
 # Language details
-class LanguageDetailView(generic.DetailView):
+class LanguageDetailView(VersionedCacheMixin, generic.DetailView):
     model = Language
 
+    def get_cache_scopes(self):
+        return [f"language:{self.kwargs['pk']}"]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         language = self.object
-        context['books'] = language.book_set.all() 
+        context['books'] = language.book_set.select_related('author').prefetch_related('genre')
         return context
     
 # Book Instance details
@@ -108,167 +162,71 @@ class BookInstanceDetailView(generic.DetailView):
         return context
 
 # Create view
-class GenericCreateView(PermissionRequiredMixin, CreateView):
-    # Gets model from kwargs
-    def get_model(self):
-        # Retrieve the model_name from URL parameters
-        model_name = self.kwargs['model_name']
-
-        # Fetch the actual model class based on the model_name
-        return apps.get_model('catalog', model_name)
-    
-    # Get fields based on dictionary 
-    def get_fields(self):
-        # Dictionary to map model_name to fields - default is all
-        fields_map = {
-            'Book': ['title', 'author', 'summary', 'isbn', 'genre', 'language'],
-            'Author': ['first_name', 'last_name', 'date_of_birth', 'date_of_death'],  
-            'Genre': ['name'],
-            'Language': ['name'],
-            'BookInstance' : ['book', 'imprint', 'due_back', 'borrower', 'status'], 
-        }
-
-        # Fetch fields based on model_name from the dictionary
-        model_name = self.kwargs['model_name']
-        return fields_map.get(model_name, '__all__') 
-    
-    # Check if user has required permissions based on model_name
-    def get_permission_required(self):
-        model_name = self.kwargs['model_name']
-        return ['catalog.add_' + model_name.lower()]
-      
-    # Redirect to a success URL after creating the object
-    def get_success_url(self):
-        # Go back to generic-list with model_name passed in
-        return reverse('generic-list', kwargs={'model_name': self.kwargs['model_name']})
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['model_name'] = self.kwargs['model_name']
-        return context
-    
-    # Pass in 
-    template_name = 'form_generic.html'
-    model = property(get_model)
-    fields = property(get_fields)
-    permission_required = property(get_permission_required)
-    success_url = property(get_success_url)
+class GenericCreateView(RegisteredModelMixin, PermissionRequiredMixin, CreateView):
+    # Model, form class, permission and template come from the registry entry for model_name
+    registry_action = 'add'
 
 # Update view
-class GenericUpdateView(PermissionRequiredMixin, UpdateView):
-    # Gets model from kwargs
-    def get_model(self):
-        # Retrieve the model_name from URL parameters
-        model_name = self.kwargs['model_name']
-
-        # Fetch the actual model class based on the model_name
-        return apps.get_model('catalog', model_name)
-    
-    # Get fields based on dictionary 
-    def get_fields(self):
-        # Dictionary to map model_name to fields - default is all
-        fields_map = {
-            'BookInstance' : ['book', 'imprint', 'due_back', 'borrower', 'status'], 
-        }
-
-        # Fetch fields based on model_name from the dictionary
-        model_name = self.kwargs['model_name']
-        return fields_map.get(model_name, '__all__') 
-    
-    # Check if user has required permissions based on model_name
-    def get_permission_required(self):
-        model_name = self.kwargs['model_name']
-        return ['catalog.change_' + model_name.lower()]
-      
-    # Redirect to a success URL after creating the object
-    def get_success_url(self):
-        # Go back to generic-list with model_name passed in
-        return reverse('generic-list', kwargs={'model_name': self.kwargs['model_name']})
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['model_name'] = self.kwargs['model_name']
-        return context
-    
-    # Pass in 
-    template_name = 'form_generic.html'
-    model = property(get_model)
-    fields = property(get_fields)
-    permission_required = property(get_permission_required)
-    success_url = property(get_success_url)
+class GenericUpdateView(RegisteredModelMixin, PermissionRequiredMixin, UpdateView):
+    registry_action = 'change'
 
 # Delete view
-class GenericDeleteView(PermissionRequiredMixin, DeleteView):
-    # Gets model from kwargs
-    def get_model(self):
-        # Retrieve the model_name from URL parameters
-        model_name = self.kwargs['model_name']
-
-        # Fetch the actual model class based on the model_name
-        return apps.get_model('catalog', model_name)
-    
-    # Check if user has required permissions based on model_name
-    def get_permission_required(self):
-        model_name = self.kwargs['model_name']
-        return ['catalog.delete_' + model_name.lower()]
-      
-    # Redirect to a success URL after creating the object
-    def get_success_url(self):
-        # Go back to generic-list with model_name passed in
-        return reverse('generic-list', kwargs={'model_name': self.kwargs['model_name']})
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['model_name'] = self.kwargs['model_name']
-        return context
-    
+class GenericDeleteView(RegisteredModelMixin, PermissionRequiredMixin, DeleteView):
+    registry_action = 'delete'
+
     def form_valid(self, form):
         try:
             self.object.delete()
-            return HttpResponseRedirect(self.success_url)
+            return HttpResponseRedirect(self.get_success_url())
         except Exception as e:
             return HttpResponseRedirect(
                 reverse('book-delete', kwargs={'pk': self.object.pk})
             )
-    
-    # Pass in 
-    template_name = 'confirm_delete_generic.html'
-    model = property(get_model)
-    permission_required = property(get_permission_required)
-    success_url = property(get_success_url)
 
 
 # List showing loaned books
-class LoanedBooksListView(LoginRequiredMixin,generic.ListView):
+class LoanedBooksListView(LoginRequiredMixin,KeysetPaginationMixin,generic.ListView):
     '''Generic class-based view listing books on loan.'''
     model = BookInstance
     template_name = 'catalog/bookinstance_borrowed_list.html'
     paginate_by = 10
+    keyset_ordering = KEYSET_ORDERINGS['BookInstance']
 
     def get_queryset(self):
-        return (
-            BookInstance.objects.filter(status__exact='o')
-            .order_by('due_back')
-        )
+        return borrowed_copies()
 
 # List showing a user's borrowed books
-class LoanedBooksByUserListView(LoginRequiredMixin,generic.ListView):
-    '''Generic class-based view listing books on loan to current user.'''
-    model = BookInstance
+class LoanedBooksByUserListView(LoginRequiredMixin,KeysetPaginationMixin,generic.ListView):
+    '''Generic class-based view listing books on loan to current user, from their cached loan summary.'''
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
+    context_object_name = 'bookinstance_list'
     paginate_by = 10
 
     def get_queryset(self):
-        return (
-            BookInstance.objects.filter(borrower=self.request.user)
-            .filter(status__exact='o')
-            .order_by('due_back')
-        )
+        self.summary = get_loan_summary(self.request.user)
+        return list(self.summary.loans)
+
+    def get_keyset_paginator(self, queryset, page_size):
+        # Cursors seek through the cached rows rather than the table
+        return ListKeysetPaginator(queryset, page_size, loan_keyset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['summary'] = self.summary
+        context['today'] = datetime.date.today()
+        return context
+
+# The current user's loan summary as JSON, for clients polling it
+def my_loan_summary(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Login required.'}, status=401)
+    return JsonResponse(get_loan_summary(request.user).as_json())
 
 # Book Instance renewal/borrow/return
 # Allow librarian to renew loaned and overdue books
 def renew_book_librarian(request, pk):
     book_instance = get_object_or_404(BookInstance, pk=pk)
+    status = 200
 
     # If this is a POST request then process the Form data
     if request.method == 'POST':
@@ -278,12 +236,15 @@ def renew_book_librarian(request, pk):
 
         # Check if the form is valid:
         if form.is_valid():
-            # process the data in form.cleaned_data as required (here we just write it to the model due_back field)
-            book_instance.due_back = form.cleaned_data['due_back']
-            book_instance.save()
+            # Only moves the due date if the copy is still on loan
+            result = loans.renew(book_instance.pk, form.cleaned_data['due_back'])
 
             # redirect to a new URL:
-            return HttpResponseRedirect(reverse('borrowed'))
+            if result.ok:
+                return HttpResponseRedirect(reverse('borrowed'))
+
+            form.add_error(None, result.message)
+            status = 409
 
     # If this is a GET (or any other method) create the default form.
     else:
@@ -295,21 +256,18 @@ def renew_book_librarian(request, pk):
         'book_instance': book_instance,
     }
 
-    return render(request, 'catalog/book_renew_librarian.html', context)
+    return render(request, 'catalog/book_renew_librarian.html', context, status=status)
 
 # Allow librarian to mark books as returned
 def book_return_librarian(request, pk):
-    book_instance = get_object_or_404(BookInstance, pk=pk)
-
-    # Sets status of book_instance to 'o' and sets borrower to current user and due date four weeks out from now
+    # Sets status of book_instance to 'a' and clears the borrower and due date, unless someone else got there first
     if request.method == 'POST':
-        book_instance.status = 'a'  # Set status to 'a' for 'Available'
-        book_instance.borrower = None
-        book_instance.due_back = None
-        book_instance.save()
+        result = loans.return_copy(pk)
+        if result.ok:
+            return HttpResponseRedirect(reverse('borrowed'))
+        return loan_conflict(request, pk, result, 'catalog/book_return.html')
 
-        return HttpResponseRedirect(reverse('borrowed'))
-    
+    book_instance = get_object_or_404(BookInstance, pk=pk)
     context = {
         'book_instance': book_instance,
     }
@@ -318,19 +276,132 @@ def book_return_librarian(request, pk):
 
 # Allow users to borrow books   
 def book_borrow(request, pk):
-    book_instance = get_object_or_404(BookInstance, pk=pk)
-
-    # Sets status of book_instance to 'o' and sets borrower to current user and due date four weeks out from now
+    # Sets status of book_instance to 'o' and sets borrower to current user and due date four weeks out from now,
+    # only if the copy is still available
     if request.method == 'POST':
-        book_instance.status = 'o'  # Set status to 'o' for 'On loan'
-        book_instance.borrower = request.user
-        book_instance.due_back = datetime.date.today() + datetime.timedelta(weeks=4)
-        book_instance.save()
+        result = loans.borrow(pk, request.user)
+        if result.ok:
+            return HttpResponseRedirect(reverse('my-borrowed'))
+        return loan_conflict(request, pk, result, 'catalog/book_borrow.html')
 
-        return HttpResponseRedirect(reverse('my-borrowed'))
-    
+    book_instance = get_object_or_404(BookInstance, pk=pk)
     context = {
         'book_instance': book_instance,
     }
 
-    return render(request, 'catalog/book_borrow.html', context)
\ No newline at end of file
+    return render(request, 'catalog/book_borrow.html', context)
+
+# Re-render a loan page with the reason a transition was refused
+def loan_conflict(request, pk, result, template_name):
+    if result.outcome == loans.NOT_FOUND:
+        raise Http404(result.message)
+
+    context = {
+        'book_instance': get_object_or_404(BookInstance, pk=pk),
+        'loan_error': result.message,
+    }
+
+    return render(request, template_name, context, status=409)
+
+# Bulk loan operations for the librarian desk
+# POST a JSON body {"ids": [...], "due_back": "YYYY-MM-DD"} or form fields ids=...&due_back=...
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def bulk_loans(request, action):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+            ids = list(data.get('ids', []))
+            due_back = data.get('due_back')
+        except (ValueError, AttributeError, TypeError):
+            return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+    else:
+        ids = request.POST.getlist('ids')
+        due_back = request.POST.get('due_back')
+
+    try:
+        if action == 'return':
+            results = loans.bulk_return(ids)
+        elif action == 'maintenance':
+            results = loans.bulk_mark_maintenance(ids)
+        elif action == 'renew':
+            # Same date rules as a single renewal
+            form = RenewBookModelForm({'due_back': due_back})
+            if not form.is_valid():
+                return JsonResponse({'errors': form.errors}, status=400)
+            results = loans.bulk_renew(ids, form.cleaned_data['due_back'])
+        else:
+            raise Http404('Unknown bulk loan action.')
+    except loans.BulkTransitionRace:
+        return JsonResponse({'error': 'Copies kept changing during the batch, try again.'}, status=409)
+
+    return JsonResponse({
+        'action': action,
+        'counts': Counter(result.outcome for result in results),
+        'results': [
+            {'id': result.book_instance_id, 'outcome': result.outcome, 'message': result.message}
+            for result in results
+        ],
+    })
+
+# Streaming export of one model as CSV or NDJSON, optionally only rows updated since a date
+def catalog_export(request, model_name):
+    if model_name not in export.EXPORT_MODELS:
+        raise Http404('Unknown model.')
+    if not request.user.has_perm('catalog.view_' + model_name.lower()):
+        raise PermissionDenied
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.EXPORT_FORMATS:
+        return JsonResponse({'error': 'format must be csv or ndjson.'}, status=400)
+
+    since = None
+    if request.GET.get('since'):
+        since = export.parse_since(request.GET['since'])
+        if since is None:
+            return JsonResponse({'error': 'since must be an ISO date or datetime.'}, status=400)
+
+    content = export.stream_export(model_name, export_format, since)
+    if isinstance(request, ASGIRequest):
+        content = export.aiter_export(content)
+    response = StreamingHttpResponse(content, content_type=export.EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{model_name.lower()}.{export_format}"'
+    return response
+
+# JSON read API over the registry models, answering conditional GETs with 304 from row versions.
+# List: ?fields=a,b&limit=N&cursor=..., or a batched lookup with ?ids=1,2,3 instead of paging.
+@require_safe
+def api_list(request, model_name):
+    entry = get_entry(model_name)
+    try:
+        fields = api.parse_fields(entry, request.GET.get('fields'))
+        if 'ids' in request.GET:
+            return api.batch_response(request, entry, api.parse_ids(entry, request.GET['ids']), fields)
+        limit = api.parse_limit(request.GET.get('limit'))
+    except api.APIError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return api.list_response(request, entry, fields, limit, request.GET.get('cursor') or None)
+
+# Detail: ?fields=a,b
+@require_safe
+def api_detail(request, model_name, pk):
+    entry = get_entry(model_name)
+    pk = api.parse_pk(entry, pk)
+    if pk is None:
+        raise Http404('Invalid id.')
+    try:
+        fields = api.parse_fields(entry, request.GET.get('fields'))
+    except api.APIError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return api.detail_response(request, entry, pk, fields)
+
+# Request metrics in the Prometheus text format, for staff or a scraper sending CATALOG_METRICS_TOKEN
+def metrics(request):
+    if not getattr(settings, 'CATALOG_METRICS', False):
+        raise Http404('Metrics are not enabled.')
+    token = getattr(settings, 'CATALOG_METRICS_TOKEN', '')
+    scraper = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (request.user.is_staff or scraper):
+        raise PermissionDenied
+
+    return HttpResponse(prometheus_text(registry.snapshot()), content_type='text/plain; version=0.0.4')
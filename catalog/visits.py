@@ -0,0 +1,21 @@
+# Home page visit counter.
+# The count lives in its own signed cookie instead of the session, so counting a visit never
+# creates or updates a django_session row, and anonymous visitors get no session at all.
+# Signing stops clients from choosing their count, losing the cookie only restarts it.
+VISITS_COOKIE_NAME = 'catalog_visits'
+VISITS_COOKIE_SALT = 'catalog.visits'
+VISITS_COOKIE_AGE = 365 * 24 * 60 * 60
+
+
+def get_visits(request):
+    '''Returns how many times this client visited the home page before.'''
+    return int(request.get_signed_cookie(VISITS_COOKIE_NAME, default='0', salt=VISITS_COOKIE_SALT))
+
+
+def count_visit(response, visits):
+    '''Stores visits + 1 in the response's cookie.'''
+    response.set_signed_cookie(
+        VISITS_COOKIE_NAME, str(visits + 1), salt=VISITS_COOKIE_SALT,
+        max_age=VISITS_COOKIE_AGE, httponly=True, samesite='Lax',
+    )
+    return response
@@ -24,9 +24,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-k$n!jdyj_j3w$uj#qzn&8+*r0el(tvy&_41isg10jwpcsb_!e9'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG=0 turns it off, DJANGO_ALLOWED_HOSTS is then a comma separated list of host names.
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') != '0'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before sessions and auth, whose reads follow the request's replica pinning
+    'catalog.routers.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -51,8 +54,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'locallibrary.urls'
+# The ASGI application (asgi.py) switches to the URLs of the async catalog views
+ROOT_URLCONF = 'locallibrary.urls_async' if os.environ.get('CATALOG_ASYNC_VIEWS') == '1' else 'locallibrary.urls'
 
+# Without explicit loaders Django wraps them in the cached loader, so templates are compiled once
+# per process (and reloaded on change under DEBUG). Template debug follows DEBUG, with it off
+# renders skip the source positions the debug error page needs.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -64,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'catalog.context_processors.navigation',
             ],
         },
     },
@@ -82,6 +90,88 @@ DATABASES = {
     }
 }
 
+# PRAGMAs run on every new SQLite connection, per alias (catalog.db)
+CATALOG_SQLITE_PRAGMAS = {}
+
+# Aliases catalog.routers.ReadWriteRouter spreads reads over, and how long a client's reads
+# stay on the primary after it wrote
+CATALOG_READ_REPLICAS = []
+# Whether those aliases can lag behind the primary, pages and fragments read from them are then not cached
+CATALOG_READ_REPLICAS_LAG = True
+CATALOG_REPLICA_PIN_SECONDS = int(os.environ.get('CATALOG_REPLICA_PIN_SECONDS', 10))
+
+# Production database profile, CATALOG_DB_PROFILE=production
+# Persistent, health-checked connections and a separate read-only 'reader' connection that
+# catalog.routers.ReadWriteRouter sends reads to. SQLite runs in WAL mode so readers never block
+# the writer. CATALOG_DB_ENGINE=postgresql uses psycopg's bounded connection pool instead.
+if os.environ.get('CATALOG_DB_PROFILE') == 'production':
+    if os.environ.get('CATALOG_DB_ENGINE') == 'postgresql':
+        DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('CATALOG_DB_NAME', 'locallibrary'),
+            'USER': os.environ.get('CATALOG_DB_USER', ''),
+            'PASSWORD': os.environ.get('CATALOG_DB_PASSWORD', ''),
+            'HOST': os.environ.get('CATALOG_DB_HOST', ''),
+            'PORT': os.environ.get('CATALOG_DB_PORT', ''),
+            # Pooled connections are returned after each request, CONN_MAX_AGE must stay 0
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('CATALOG_DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('CATALOG_DB_POOL_MAX', 10)),
+                    'timeout': int(os.environ.get('CATALOG_DB_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
+    else:
+        DATABASES['default'].update({
+            'NAME': os.environ.get('CATALOG_DB_NAME', DATABASES['default']['NAME']),
+            'CONN_MAX_AGE': int(os.environ.get('CATALOG_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds to wait for the write lock, and take it when a transaction starts
+                # rather than failing to upgrade a read lock half way through
+                'timeout': int(os.environ.get('CATALOG_DB_BUSY_TIMEOUT', 5)),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+        SQLITE_PRAGMAS = {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': int(os.environ.get('CATALOG_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            # Negative sizes are KiB, 64 MiB of page cache per connection
+            'cache_size': -int(os.environ.get('CATALOG_SQLITE_CACHE_KIB', 64 * 1024)),
+            'temp_store': 'MEMORY',
+        }
+        CATALOG_SQLITE_PRAGMAS = {
+            'default': SQLITE_PRAGMAS,
+            'reader': {**SQLITE_PRAGMAS, 'query_only': 'ON'},
+        }
+
+    # Same database, its own connection. Tests run it on the default connection.
+    READER_OPTIONS = {key: value for key, value in DATABASES['default'].get('OPTIONS', {}).items() if key != 'transaction_mode'}
+    DATABASES['reader'] = {
+        **DATABASES['default'],
+        'OPTIONS': READER_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    }
+    CATALOG_READ_REPLICAS = ['reader']
+    CATALOG_READ_REPLICAS_LAG = False
+
+    # Read replicas, CATALOG_DB_REPLICAS is a comma separated list of SQLite files or Postgres hosts.
+    # They replace 'reader', tests run them on the default connection too.
+    REPLICA_KEY = 'HOST' if os.environ.get('CATALOG_DB_ENGINE') == 'postgresql' else 'NAME'
+    REPLICAS = [value for value in os.environ.get('CATALOG_DB_REPLICAS', '').split(',') if value]
+    for index, value in enumerate(REPLICAS, start=1):
+        DATABASES[f'replica_{index}'] = {**DATABASES['reader'], REPLICA_KEY: value}
+        if 'reader' in CATALOG_SQLITE_PRAGMAS:
+            CATALOG_SQLITE_PRAGMAS[f'replica_{index}'] = CATALOG_SQLITE_PRAGMAS['reader']
+    if REPLICAS:
+        CATALOG_READ_REPLICAS = [f'replica_{index}' for index in range(1, len(REPLICAS) + 1)]
+        CATALOG_READ_REPLICAS_LAG = True
+
+    DATABASE_ROUTERS = ['catalog.routers.ReadWriteRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -127,3 +217,28 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = '/'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Request metrics (catalog.metrics), off unless CATALOG_METRICS=1
+CATALOG_METRICS = os.environ.get('CATALOG_METRICS') == '1'
+if CATALOG_METRICS:
+    # First, so the queries of session and auth middleware are measured too
+    MIDDLEWARE.insert(0, 'catalog.metrics.QueryMetricsMiddleware')
+# Requests running more SQL queries than this are logged with their repeated SQL
+CATALOG_QUERY_BUDGET = 20
+# /catalog/_metrics is served to staff, and to a scraper sending "Authorization: Bearer <token>" when set
+CATALOG_METRICS_TOKEN = os.environ.get('CATALOG_METRICS_TOKEN', '')
+
+# Cache
+# Local memory by default, set CATALOG_CACHE_DIR to share the page cache between processes
+if os.environ.get('CATALOG_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CATALOG_CACHE_DIR'],
+        }
+    }
+    # Sessions are read on every authenticated request, read them through the shared cache.
+    # Not with the per-process default, which could keep serving a session another process ended.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Safety net lifetime of cached pages and fragments (catalog.caching), signals invalidate them first
+CATALOG_PAGE_CACHE_TIMEOUT = 60 * 60
@@ -0,0 +1,13 @@
+"""
+URL configuration of the ASGI application.
+
+The same routes as locallibrary.urls, with the catalog's read-only views served by
+their native async versions (catalog.urls_async).
+"""
+from django.urls import include, path
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('catalog/', include('catalog.urls_async')) if str(pattern.pattern) == 'catalog/' else pattern
+    for pattern in sync_urlpatterns
+]